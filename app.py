@@ -51,25 +51,77 @@ contests_dashboard/
     └── all_ratings.txt
 '''
 
-import itertools
-import math
 import time
 
-from flask import Flask, render_template_string, send_from_directory, jsonify, request
+STARTUP_STARTED = time.perf_counter()  # Начало импорта модуля, для отчета о холодном старте
+
+import contextlib
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+
+from flask import Flask, send_from_directory, jsonify, request, Response
+from markupsafe import Markup
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-import matplotlib
 import json
 
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import click
 from io import BytesIO
 import base64
+import bisect
+import gzip
+import hashlib
 import re
 import csv
 
+try:
+    import brotli  # Необязательно: без него отдаются только gzip и несжатый вариант
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl  # Блокировка файлов рейтингов между воркерами; на Windows ее нет
+except ImportError:
+    fcntl = None
+
 app = Flask(__name__)
 
+# Быстрый старт для serverless: рейтинги и matplotlib загружаются при первом обращении.
+# На Vercel включен по умолчанию, в остальных случаях - FAST_START=1
+FAST_START = os.environ.get('FAST_START', '1' if os.environ.get('VERCEL') else '0') == '1'
+
+startup_timings = {}  # {этап: мс} - стоимость холодного старта
+
+
+def record_startup_timing(stage, started):
+    """Запоминает и печатает длительность этапа запуска"""
+    elapsed = round((time.perf_counter() - started) * 1000, 1)
+    startup_timings[stage] = elapsed
+    print(f"Запуск: {stage} - {elapsed} мс")
+
+
+_matplotlib_classes = None
+
+
+def load_matplotlib():
+    """Импортирует matplotlib при первом построении графика"""
+    global _matplotlib_classes
+    if _matplotlib_classes is None:
+        started = time.perf_counter()
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        _matplotlib_classes = (Figure, FigureCanvasAgg)
+        record_startup_timing('matplotlib', started)
+    return _matplotlib_classes
+
+
 HTML = '''
 <!DOCTYPE html>
 <html lang="ru">
@@ -1294,7 +1346,9 @@ HTML = '''
                 <span id="tabTitle"><i class="fas fa-trophy"></i> Контесты</span>
             </div>
 
-            <div class="news-container" id="contestsContainer">
+            <div class="news-container" id="contestsContainer" data-api="/api/contests" data-rendered="1"
+                 data-total="{{ total_contests }}" data-page-size="{{ page_size }}" data-all-tags="{{ contest_tags }}">
+                {%- if fragments.contests is defined %}{{ fragments.contests }}{% else %}{% block contests_section %}
                 {% if contests %}
                     {% for contest in contests %}
                     <div class="contest-item" 
@@ -1390,9 +1444,12 @@ HTML = '''
                     <p>Добавьте контесты в папку contests/</p>
                 </div>
                 {% endif %}
+                {%- endblock %}{% endif %}
             </div>
 
-            <div class="news-container" id="trainingsContainer" style="display: none;">
+            <div class="news-container" id="trainingsContainer" style="display: none;" data-api="/api/trainings" data-rendered="0"
+                 data-total="{{ total_trainings }}" data-page-size="{{ page_size }}" data-all-tags="{{ training_tags }}">
+                {%- if fragments.trainings is defined %}{{ fragments.trainings }}{% else %}{% block trainings_section %}
                 {% if trainings %}
                     {% for training in trainings %}
                     <div class="contest-item" 
@@ -1477,9 +1534,12 @@ HTML = '''
                     <p>Добавьте тренировки в папку trainings/</p>
                 </div>
                 {% endif %}
+                {%- endblock %}{% endif %}
             </div>
 
-            <div class="news-container" id="teamContainer" style="display: none;">
+            <div class="news-container" id="teamContainer" style="display: none;" data-api="/api/team_contests" data-rendered="0"
+                 data-total="{{ total_team_contests }}" data-page-size="{{ page_size }}" data-all-tags="{{ team_tags }}">
+                {%- if fragments.team_contests is defined %}{{ fragments.team_contests }}{% else %}{% block team_contests_section %}
                 {% if team_contests %}
                     {% for contest in team_contests %}
                     <div class="contest-item" 
@@ -1549,9 +1609,11 @@ HTML = '''
                     <p>Добавьте командные контесты в папку team_contests/</p>
                 </div>
                 {% endif %}
+                {%- endblock %}{% endif %}
             </div>
 
             <div class="news-container" id="mathContainer" style="display: none;">
+                {%- if fragments.math_problems is defined %}{{ fragments.math_problems }}{% else %}{% block math_problems_section %}
                 {% if math_problems %}
                     {% for math in math_problems %}
                     <div class="contest-item" 
@@ -1609,9 +1671,11 @@ HTML = '''
                     <p>Добавьте PDF-файлы с условиями в папку math/</p>
                 </div>
                 {% endif %}
+                {%- endblock %}{% endif %}
             </div>
 
             <div class="news-container" id="newsContainer" style="display: none;">
+                {%- if fragments.news is defined %}{{ fragments.news }}{% else %}{% block news_section %}
                 {% if news %}
                     {% for item in news %}
                     <div class="contest-item" 
@@ -1669,6 +1733,7 @@ HTML = '''
                     <p>Добавьте новости в папку news/</p>
                 </div>
                 {% endif %}
+                {%- endblock %}{% endif %}
             </div>
 
             <div class="contact-info">
@@ -1692,6 +1757,7 @@ HTML = '''
                 </div>
 
                 <div class="rating-container">
+                    {%- if fragments.participants is defined %}{{ fragments.participants }}{% else %}{% block participants_section %}
                     {% if participants %}
                         {% for participant in participants[:15] %}
                         <div class="rating-item" 
@@ -1740,6 +1806,7 @@ HTML = '''
                         <p>Обработайте контесты для расчета рейтингов</p>
                     </div>
                     {% endif %}
+                    {%- endblock %}{% endif %}
                 </div>
             </div>
 
@@ -1750,6 +1817,7 @@ HTML = '''
     </div>
     <div class="upcoming-content">
         <div class="upcoming-list">
+            {%- if fragments.upcoming_contests is defined %}{{ fragments.upcoming_contests }}{% else %}{% block upcoming_contests_section %}
             {% if upcoming_contests %}
                 {% for contest in upcoming_contests %}
                 <div class="upcoming-item">
@@ -1797,6 +1865,7 @@ HTML = '''
                 </p>
             </div>
             {% endif %}
+            {%- endblock %}{% endif %}
         </div>
     </div>
 </div>
@@ -1859,6 +1928,122 @@ HTML = '''
         let selectedTags = new Set();
         let allTagsByCategory = {};
 
+        // Вкладки, карточки которых подгружаются с сервера по страницам
+        const PAGED_TABS = {
+            'contests': 'contestsContainer',
+            'trainings': 'trainingsContainer',
+            'team': 'teamContainer'
+        };
+        const pagedState = {};
+        let pagedSearchTimer = null;
+
+        function currentFilterKey() {
+            const searchTerm = document.getElementById('searchInput').value.toLowerCase().trim();
+            return JSON.stringify([searchTerm, Array.from(selectedTags).sort()]);
+        }
+
+        function getPagedState(tab) {
+            if (!pagedState[tab]) {
+                const container = document.getElementById(PAGED_TABS[tab]);
+                const rendered = container.dataset.rendered === '1';
+                pagedState[tab] = {
+                    // Первая страница активной вкладки приходит вместе с HTML
+                    filterKey: rendered ? JSON.stringify(['', []]) : null,
+                    loaded: rendered ? container.querySelectorAll('.contest-item[data-id]').length : 0,
+                    total: parseInt(container.dataset.total || '0', 10),
+                    loading: false
+                };
+            }
+            return pagedState[tab];
+        }
+
+        function updateLoadMore(tab) {
+            const container = document.getElementById(PAGED_TABS[tab]);
+            const state = getPagedState(tab);
+
+            container.querySelectorAll('.load-more-item').forEach(el => el.remove());
+            if (state.loaded < state.total) {
+                container.insertAdjacentHTML('beforeend', `
+                    <div class="contest-item load-more-item" style="text-align: center;">
+                        <button class="contest-link" onclick="loadTabPage('${tab}', false)">
+                            <i class="fas fa-chevron-down"></i> Показать еще (${state.total - state.loaded})
+                        </button>
+                    </div>
+                `);
+            }
+        }
+
+        function loadTabPage(tab, reset) {
+            const container = document.getElementById(PAGED_TABS[tab]);
+            const state = getPagedState(tab);
+            if (state.loading) return;
+
+            const filterKey = currentFilterKey();
+            const searchTerm = document.getElementById('searchInput').value.toLowerCase().trim();
+            const params = new URLSearchParams({
+                offset: reset ? 0 : state.loaded,
+                limit: container.dataset.pageSize
+            });
+            if (searchTerm) params.set('q', searchTerm);
+            if (selectedTags.size > 0) params.set('tags', Array.from(selectedTags).join(','));
+
+            state.loading = true;
+            container.querySelectorAll('.load-more-item, .no-results-message').forEach(el => el.remove());
+            if (reset) {
+                container.innerHTML = `
+                    <div class="contest-item" style="text-align: center; padding: 40px 20px; color: #999;">
+                        <i class="fas fa-spinner fa-spin"></i> Загрузка...
+                    </div>
+                `;
+            }
+
+            fetch(`${container.dataset.api}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    state.loading = false;
+                    if (!data.success) {
+                        throw new Error(data.error);
+                    }
+
+                    if (reset) {
+                        container.innerHTML = '';
+                        state.loaded = 0;
+                    }
+                    container.insertAdjacentHTML('beforeend', data.html);
+                    state.loaded += data.items.length;
+                    state.total = data.total;
+                    state.filterKey = filterKey;
+
+                    if (data.total === 0 && !data.html) {
+                        container.insertAdjacentHTML('beforeend', `
+                            <div class="contest-item no-results-message" style="text-align: center; padding: 40px 20px; color: #999;">
+                                <i class="fas fa-search" style="font-size: 48px; margin-bottom: 15px;"></i>
+                                <h3>Ничего не найдено</h3>
+                                <p>Попробуйте изменить параметры поиска или фильтрации</p>
+                            </div>
+                        `);
+                    }
+                    updateLoadMore(tab);
+
+                    // Фильтр успел измениться, пока шел запрос
+                    if (tab === currentTab && currentFilterKey() !== state.filterKey) {
+                        loadTabPage(tab, true);
+                    }
+                })
+                .catch(error => {
+                    state.loading = false;
+                    container.querySelectorAll('.load-more-item').forEach(el => el.remove());
+                    container.insertAdjacentHTML('beforeend', `
+                        <div class="contest-item load-more-item" style="text-align: center; color: #f44336;">
+                            Ошибка загрузки
+                            <button class="contest-link" onclick="loadTabPage('${tab}', ${reset})">
+                                <i class="fas fa-redo"></i> Попробовать снова
+                            </button>
+                        </div>
+                    `);
+                });
+        }
+
         function showTab(tab) {
             currentTab = tab;
 
@@ -1943,6 +2128,17 @@ HTML = '''
                 });
             }
 
+            // Для вкладок со страничной загрузкой полный список тегов приходит с сервера
+            const pagedCategories = {'contest': 'contests', 'training': 'trainings', 'team': 'team'};
+            for (const [type, tab] of Object.entries(pagedCategories)) {
+                const allTags = document.getElementById(PAGED_TABS[tab]).dataset.allTags;
+                (allTags ? allTags.split(',') : []).forEach(tag => {
+                    if (tag.trim()) {
+                        allTagsByCategory[type].add(tag.trim());
+                    }
+                });
+            }
+
             // Отображаем теги по категориям
             renderTagCategories();
         }
@@ -2118,7 +2314,15 @@ HTML = '''
                 'news': '.contest-item[data-type="news"]'
             };
 
-            if (currentTab in containers) {
+            if (currentTab in PAGED_TABS) {
+                // Поиск и теги для этих вкладок применяются на сервере ко всему архиву
+                const state = getPagedState(currentTab);
+                if (state.filterKey !== currentFilterKey()) {
+                    const tab = currentTab;
+                    clearTimeout(pagedSearchTimer);
+                    pagedSearchTimer = setTimeout(() => loadTabPage(tab, true), state.filterKey === null ? 0 : 250);
+                }
+            } else if (currentTab in containers) {
                 const items = document.querySelectorAll(containers[currentTab]);
                 let visibleCount = 0;
 
@@ -2216,6 +2420,8 @@ HTML = '''
 
         // Инициализация при загрузке страницы
         document.addEventListener('DOMContentLoaded', function() {
+            updateLoadMore('contests');
+
             const urlParams = new URLSearchParams(window.location.search);
             const userParam = urlParams.get('user');
             const tabParam = urlParams.get('tab');
@@ -2709,8 +2915,17 @@ HTML = '''
 
             modal.style.display = 'block';
 
-            fetch(`/api/user/${encodeURIComponent(nickname)}/chart`)
-                .then(response => response.text())
+            // График рисуется в браузере по точкам; PNG с сервера - запасной вариант
+            fetch(`/api/user/${encodeURIComponent(nickname)}/rating-series`)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success || data.series.length < 2) {
+                        throw new Error('no series');
+                    }
+                    return renderRatingSeries(data);
+                })
+                .catch(() => fetch(`/api/user/${encodeURIComponent(nickname)}/chart`)
+                    .then(response => response.text()))
                 .then(html => {
                     modalContent.innerHTML = `
                         <h2><i class="fas fa-user"></i> ${nickname}</h2>
@@ -2733,6 +2948,53 @@ HTML = '''
                 });
         }
 
+        function renderRatingSeries(data) {
+            const series = data.series;
+            const width = 1000, height = 480;
+            const left = 60, right = 20, top = 50, bottom = 60;
+
+            const ratings = series.map(point => point.rating);
+            const yMin = Math.max(0, Math.min(...ratings) - 100);
+            const yMax = Math.min(4000, Math.max(...ratings) + 100);
+            const ySpan = Math.max(1, yMax - yMin);
+
+            const x = i => left + (series.length === 1 ? 0 : i * (width - left - right) / (series.length - 1));
+            const y = r => top + (yMax - r) * (height - top - bottom) / ySpan;
+
+            const step = series.length <= 30 ? 1 : Math.max(1, Math.floor(series.length / 20));
+            const path = series.map((point, i) => `${i ? 'L' : 'M'}${x(i).toFixed(1)},${y(point.rating).toFixed(1)}`).join(' ');
+
+            let ticks = '';
+            series.forEach((point, i) => {
+                if (i % step === 0) {
+                    const label = point.event.replace('contest_', '');
+                    ticks += `<text x="${x(i)}" y="${height - bottom + 18}" font-size="11" text-anchor="end"
+                                    transform="rotate(-45 ${x(i)} ${height - bottom + 18})">${label}</text>`;
+                }
+            });
+
+            const dots = series.map((point, i) => `
+                <circle cx="${x(i)}" cy="${y(point.rating)}" r="4" fill="#000">
+                    <title>${point.title}: ${point.rating} (${point.change >= 0 ? '+' : ''}${point.change}), Div ${point.division}, место ${point.position}</title>
+                </circle>`).join('');
+
+            return `
+                <div class="chart-container">
+                    <svg viewBox="0 0 ${width} ${height}" style="width: 100%; height: auto;">
+                        <text x="${width / 2}" y="25" font-size="16" font-weight="bold" text-anchor="middle">Изменение рейтинга: ${data.nickname}</text>
+                        <text x="${left + 10}" y="${top + 20}" font-size="14" font-weight="bold" fill="${data.rank_color}">Текущий: ${data.current_rating} (${data.rank})</text>
+                        <line x1="${left}" y1="${top}" x2="${left}" y2="${height - bottom}" stroke="#ccc"/>
+                        <line x1="${left}" y1="${height - bottom}" x2="${width - right}" y2="${height - bottom}" stroke="#ccc"/>
+                        <text x="${left - 8}" y="${y(yMax) + 4}" font-size="11" text-anchor="end">${yMax}</text>
+                        <text x="${left - 8}" y="${y(yMin) + 4}" font-size="11" text-anchor="end">${yMin}</text>
+                        <path d="${path}" fill="none" stroke="#000" stroke-width="2" stroke-opacity="0.8"/>
+                        ${dots}
+                        ${ticks}
+                    </svg>
+                </div>
+            `;
+        }
+
         function showUserDetails(nickname) {
             fetch(`/api/user/${encodeURIComponent(nickname)}/details`)
                 .then(response => response.json())
@@ -3286,6 +3548,56 @@ HTML = '''
                 });
         }
 
+        function showJobProgress(text) {
+            let box = document.getElementById('job-progress');
+            if (!box) {
+                box = document.createElement('div');
+                box.id = 'job-progress';
+                box.style.cssText = 'position:fixed;right:20px;bottom:20px;z-index:2000;padding:12px 16px;' +
+                    'background:#2c3e50;color:#fff;border-radius:8px;box-shadow:0 4px 12px rgba(0,0,0,0.2);';
+                document.body.appendChild(box);
+            }
+            box.textContent = text;
+            box.style.display = text ? 'block' : 'none';
+        }
+
+        function waitForJob(jobId, errorMessage) {
+            fetch(`/api/jobs/${jobId}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        showJobProgress('');
+                        alert(data.error || errorMessage);
+                        return;
+                    }
+
+                    const job = data.job;
+                    if (job.status === 'done') {
+                        showJobProgress('');
+                        alert(job.message);
+                        location.reload();
+                    } else if (job.status === 'failed') {
+                        showJobProgress('');
+                        alert(job.error || errorMessage);
+                    } else {
+                        const progress = job.progress || {};
+                        let text = job.status === 'queued' ? 'В очереди...' : 'Обработка...';
+                        if (progress.division) {
+                            text += ` Div ${progress.division}`;
+                        }
+                        if (progress.rows_total) {
+                            text += `: ${progress.rows_processed || 0}/${progress.rows_total}`;
+                        }
+                        showJobProgress(text);
+                        setTimeout(() => waitForJob(jobId, errorMessage), 1000);
+                    }
+                })
+                .catch(error => {
+                    showJobProgress('');
+                    alert(errorMessage);
+                });
+        }
+
         function processContest(contestId) {
             if (confirm(`Обработать контест ${contestId}?`)) {
                 fetch(`/api/contest/${contestId}/process-all`, { 
@@ -3293,7 +3605,9 @@ HTML = '''
                 })
                     .then(response => response.json())
                     .then(data => {
-                        if (data.success) {
+                        if (data.success && data.status_url) {
+                            waitForJob(data.job_id, 'Ошибка обработки контеста');
+                        } else if (data.success) {
                             alert(data.message);
                             location.reload();
                         } else {
@@ -3313,7 +3627,9 @@ HTML = '''
                 })
                     .then(response => response.json())
                     .then(data => {
-                        if (data.success) {
+                        if (data.success && data.status_url) {
+                            waitForJob(data.job_id, 'Ошибка обработки тренировки');
+                        } else if (data.success) {
                             alert(data.message);
                             location.reload();
                         } else {
@@ -3333,7 +3649,9 @@ HTML = '''
                 })
                     .then(response => response.json())
                     .then(data => {
-                        if (data.success) {
+                        if (data.success && data.status_url) {
+                            waitForJob(data.job_id, 'Ошибка обработки командного контеста');
+                        } else if (data.success) {
                             alert(data.message);
                             location.reload();
                         } else {
@@ -3414,193 +3732,900 @@ class DivisionSystem:
         return min_rating <= rating <= max_rating
 
 
-class RatingSystem:
-    def __init__(self, base_path):
-        self.base_path = Path(base_path)
-        self.contests_path = self.base_path / 'contests'
-        self.trainings_path = self.base_path / 'trainings'
-        self.team_contests_path = self.base_path / 'team_contests'
-        self.contestants_path = self.base_path / 'contestants'
+# ========== КЭШ РАЗОБРАННЫХ ФАЙЛОВ ==========
 
-        self.users = {}  # {nickname: {'rating': int, 'tasks_score': int}}
-        self.user_history = {}  # История контестов пользователя
-        self.user_training_history = {}
+class FileVersionCache:
+    """LRU-кэш разобранных файлов, привязанный к версии файла (mtime, size)"""
 
-        self.contests_path.mkdir(parents=True, exist_ok=True)
-        self.trainings_path.mkdir(parents=True, exist_ok=True)
-        self.team_contests_path.mkdir(parents=True, exist_ok=True)
-        self.contestants_path.mkdir(parents=True, exist_ok=True)
+    def __init__(self, loader, max_entries=256, related=None):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.related = related  # path -> связанные файлы, изменение которых тоже сбрасывает запись
+        self._entries = OrderedDict()  # {path: (version, value)}
+        self._lock = threading.Lock()
 
-        self.load_all_data()
+    @staticmethod
+    def file_version(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
 
-    # ========== ОСНОВНЫЕ МЕТОДЫ ==========
+    def get(self, path):
+        """Возвращает разобранный файл, перечитывая его только при изменении"""
+        key = str(path)
+        version = self.file_version(key)
+        if version is None:
+            return None
+        if self.related is not None:
+            version = (version,) + tuple(self.file_version(p) for p in self.related(Path(key)))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = self.loader(Path(key))
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
 
-    def get_user_rating(self, nickname):
-        """Возвращает текущий рейтинг пользователя"""
-        if nickname not in self.users:
-            return 0
-        return self.users[nickname].get('rating', 0)
 
-    def get_user_division(self, nickname):
-        """Определяет дивизион пользователя по его текущему рейтингу"""
-        rating = self.get_user_rating(nickname)
+class ParsedMonitor:
+    """Разобранный monitor.csv: названия задач, индекс по никнейму и статусы ячеек"""
 
-        if rating < 0:
-            return 4
-        elif 0 <= rating <= 999:
-            return 4
-        elif 1000 <= rating <= 1999:
-            return 3
-        elif 2000 <= rating <= 2999:
-            return 2
-        elif 3000 <= rating <= 4000:
-            return 1
-        else:
-            return 1  # Если рейтинг выше 4000 - Div1
+    EXCLUDE_FIELDS = ['place', 'user_name', 'login', 'Участник', 'участник',
+                      'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
+                      'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name', 'никнейм',
+                      'Имя', 'имя', 'Nickname', 'nickname']
+    # Колонки, которые не считаются задачами при подсчете решенных для рейтинга
+    SCORE_EXCLUDE_FIELDS = ['place', 'user_name', 'login', 'Участник', 'участник',
+                            'Score', 'Penalty', 'score', 'penalty', 'Баллы', 'баллы',
+                            'user', 'User', 'USER', 'фио', 'ФИО']
 
-    def get_user_max_rating(self, nickname):
-        """Возвращает максимальный рейтинг пользователя из истории"""
-        if nickname not in self.user_history:
-            return self.get_user_rating(nickname)
+    def __init__(self, monitor_file):
+        with open(monitor_file, 'r', encoding='utf-8') as f:
+            sample = f.read(1024)
+            f.seek(0)
 
-        max_rating = 0
-        for record in self.user_history[nickname]:
-            if not record.get('unofficial', False):
-                new_rating = record.get('new_rating', 0)
-                if new_rating > max_rating:
-                    max_rating = new_rating
+            if ';' in sample:
+                reader = csv.DictReader(f, delimiter=';')
+            else:
+                reader = csv.DictReader(f)
 
-        current_rating = self.get_user_rating(nickname)
-        return max(max_rating, current_rating)
+            self.fieldnames = reader.fieldnames or []
+            self.rows = list(reader)
+
+        self.task_names = [field for field in self.fieldnames
+                           if field not in self.EXCLUDE_FIELDS
+                           and not field.startswith('Unnamed:')
+                           and not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower())
+                           and field.strip() != '']
+
+        self.nicknames = []  # Никнейм для каждой строки ('' если не указан)
+        self.index = {}  # {nickname: номер первой строки}
+        self.cells = []  # Разобранные ячейки задач для каждой строки
+
+        for i, row in enumerate(self.rows):
+            nickname = (row.get('user_name', '') or row.get('login', '') or row.get('Участник', '') or '').strip()
+            self.nicknames.append(nickname)
+            if nickname and nickname not in self.index:
+                self.index[nickname] = i
+
+            self.cells.append([self.parse_cell(task_name, row.get(task_name))
+                               for task_name in self.task_names])
+
+        self._scores = None
+
+    def scores(self):
+        """[(никнейм, баллы, решено задач)] по строкам с никнеймом; считается один раз на версию файла"""
+        if self._scores is None:
+            scores = []
+            for i, row in enumerate(self.rows):
+                nickname = self.nicknames[i]
+                if not nickname:
+                    continue
 
-    def get_user_tasks_score(self, nickname):
-        if nickname not in self.users:
-            return 0
-        return self.users[nickname].get('tasks_score', 0)
+                score_str = row.get('Score', '0') or row.get('score', '0') or row.get('Баллы', '0')
+                try:
+                    score = float(score_str)
+                except:
+                    score = 0
 
-    def get_rank_title(self, rating):
-        if rating < 400:
-            return "Новичок"
-        elif rating < 800:
-            return "Ученик"
-        elif rating < 1200:
-            return "Практик"
-        elif rating < 1600:
-            return "Специалист"
-        elif rating < 2000:
-            return "Эксперт"
-        elif rating < 2400:
-            return "Кандидат в мастера"
-        elif rating < 2800:
-            return "Мастер"
-        elif rating < 3200:
-            return "Грандмастер"
-        elif rating < 3600:
-            return "Легендарный мастер"
-        else:
-            return "Абсолютный мастер"
+                tasks_solved = 0
+                for key, value in row.items():
+                    if key.lower() not in self.SCORE_EXCLUDE_FIELDS:
+                        if value and ('+' in str(value) or str(value).isdigit() and int(value) > 0):
+                            tasks_solved += 1
 
-    def get_rank_color(self, rating):
-        if rating < 400:
-            return "#804000"
-        elif rating < 800:
-            return "#808080"
-        elif rating < 1200:
-            return "#008000"
-        elif rating < 1600:
-            return "#00C0C0"
-        elif rating < 2000:
-            return "#0000FF"
-        elif rating < 2400:
-            return "#AA00AA"
-        elif rating < 2800:
-            return "#C0C000"
-        elif rating < 3200:
-            return "#FF8000"
-        elif rating < 3600:
-            return "#FF0000"
-        else:
-            return "#FF0066"
+                scores.append((nickname, score, tasks_solved))
+            self._scores = scores
+        return self._scores
 
-    def get_avatar_color(self, nickname):
-        hash_val = sum(ord(c) for c in nickname) % 360
-        return f'hsl({hash_val}, 70%, 60%)'
+    @staticmethod
+    def parse_cell(task_name, task_value):
+        task_value = (task_value or '').strip()
+        status = 'pending'
+        display = task_value
+
+        if task_value:
+            if '+' in task_value:
+                status = 'solved'
+                display = '+' + task_value.replace('+', '')
+            elif task_value.isdigit() and int(task_value) > 0:
+                status = 'solved'
+                display = task_value
+            elif '-' in task_value:
+                status = 'attempted'
+                display = '-' + task_value.replace('-', '')
 
-    def get_user_stats(self, nickname):
-        """Возвращает статистику пользователя"""
-        if nickname not in self.users:
-            return None
+        return {
+            'name': task_name,
+            'value': task_value,
+            'status': status,
+            'display': display
+        }
+
+    def find(self, nickname):
+        """Возвращает номер строки участника или None"""
+        return self.index.get(nickname)
+
+
+class ParsedChangeFile:
+    """Разобранный change.txt: поля заголовка и строки результатов"""
+
+    CONTEST_ROW_RE = re.compile(
+        r'(\d+)\.\s+([^:]+):\s+(\d+)\s+\([^)]+\)\s+→\s+(\d+)\s+\([^)]+\)\s+\(([+-]\d+)\)')
+    TRAINING_ROW_RE = re.compile(r'(\d+)\.\s+([^:]+):\s+решено\s+(\d+)\s+задач')
+    TEAM_ROW_RE = re.compile(r'(\d+)\.\s+([^:]+):\s+(\d+)\s+баллов')
+    TASKS_SOLVED_RE = re.compile(r'задач:\s+(\d+)')
+    ALLOWED_DIV_RE = re.compile(r'allowed_div[:=](\d+)')
+
+    # Колонки строк в change.json
+    SIDECAR_COLUMNS = ['position', 'nickname', 'old_rating', 'new_rating', 'change',
+                       'unofficial', 'tasks_solved', 'allowed_division']
+
+    def __init__(self, change_file):
+        change_file = Path(change_file)
+
+        self.processed_at = None  # Дата обработки целиком
+        self.date = None  # Дата обработки (YYYY-MM-DD)
+        self.total_participants = None  # Участников всего
+        self.official_participants = None  # Участников официально
+        self.participants = None  # Участников (тренировки)
+        self.rows = []  # Строки контеста с изменением рейтинга
+        self.training_rows = []
+        self.team_rows = []
+        self.winner = ""
+        self.winner_rating = 0
+        self.from_sidecar = False
+        self.monitor_digest = None  # sha1 monitor.csv, по которому посчитан файл (только из change.json)
+
+        sidecar = self.sidecar_path(change_file)
+        if self.sidecar_is_fresh(change_file, sidecar):
+            try:
+                self.load_sidecar(sidecar)
+                self.from_sidecar = True
+            except Exception as e:
+                print(f"Ошибка чтения {sidecar}, используется change.txt: {e}")
+                self.processed_at = None
+                self.date = None
+                self.total_participants = None
+                self.official_participants = None
+                self.monitor_digest = None
+                self.rows = []
+
+        if not self.from_sidecar:
+            self.parse_text(change_file)
+
+        for row in self.rows:
+            if row['position'] == 1:
+                self.winner = row['nickname']
+                self.winner_rating = row['new_rating']
+                break
 
-        current_rating = self.get_user_rating(nickname)
-        tasks_score = self.get_user_tasks_score(nickname)
-        history = self.user_history.get(nickname, [])
-        training_history = self.user_training_history.get(nickname, [])
+    @staticmethod
+    def sidecar_path(change_file):
+        return Path(change_file).with_name('change.json')
 
-        official_history = [h for h in history if not h.get('unofficial', False)]
+    @staticmethod
+    def sidecar_is_fresh(change_file, sidecar):
+        """change.json используется, только если он не старше change.txt"""
+        try:
+            return os.stat(sidecar).st_mtime_ns >= os.stat(change_file).st_mtime_ns
+        except OSError:
+            return False
 
-        best_rating = self.get_user_max_rating(nickname)
+    def load_sidecar(self, sidecar):
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        self.processed_at = data.get('processed_at') or None
+        self.date = self.processed_at.split()[0] if self.processed_at else None
+        self.total_participants = data.get('participants_total')
+        self.official_participants = data.get('official_participants')
+        self.monitor_digest = data.get('monitor_sha1')
+
+        columns = data['columns']
+        for values in data['rows']:
+            row = dict(zip(columns, values))
+            self.rows.append({
+                'position': int(row['position']),
+                'nickname': row['nickname'],
+                'old_rating': int(row['old_rating']),
+                'new_rating': int(row['new_rating']),
+                'change': int(row['change']),
+                'unofficial': bool(row['unofficial']),
+                'tasks_solved': int(row.get('tasks_solved') or 0),
+                'allowed_division': row.get('allowed_division')
+            })
 
-        last_contest = "Нет"
-        if official_history:
-            def contest_number_key(record):
-                contest_id = record.get('contest', '')
-                match = re.search(r'contest_(\d+)', contest_id)
-                if match:
-                    return int(match.group(1))
-                return 0
-
-            sorted_history = sorted(official_history, key=contest_number_key, reverse=True)
-            if sorted_history:
-                last_record = sorted_history[0]
-                last_contest = last_record['contest'].replace('contest_', '')
+    @classmethod
+    def write_sidecar(cls, change_file, contest_id, division, processed_at, total_participants,
+                      official_participants, rows, path=None, monitor_digest=None):
+        """Записывает change.json рядом с change.txt (или в path)"""
+        data = {
+            'contest': contest_id,
+            'division': division,
+            'processed_at': processed_at,
+            'participants_total': total_participants,
+            'official_participants': official_participants,
+            'columns': cls.SIDECAR_COLUMNS,
+            'rows': [[row.get(column) for column in cls.SIDECAR_COLUMNS] for row in rows]
+        }
+        if monitor_digest:
+            data['monitor_sha1'] = monitor_digest
+        with open(path or cls.sidecar_path(change_file), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def parse_text(self, change_file):
+        with open(change_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        start_line = 0
+        for i, line in enumerate(lines):
+            if '=====' in line:
+                start_line = i + 1
+                break
+
+        for line in (lines[:start_line] if start_line else lines):
+            if self.date is None and 'Дата обработки:' in line:
+                date_part = line.split('Дата обработки:')[1].strip()
+                self.processed_at = date_part or None
+                self.date = date_part.split()[0] if date_part else None
+            elif self.total_participants is None and 'Участников всего:' in line:
+                try:
+                    self.total_participants = int(line.split(':')[1].strip())
+                except:
+                    pass
+            elif self.official_participants is None and 'Участников официально:' in line:
+                try:
+                    self.official_participants = int(line.split(':')[1].strip())
+                except:
+                    pass
+            elif 'Участников:' in line:
+                try:
+                    self.participants = int(line.split(':')[1].strip())
+                except:
+                    pass
 
-        return {
-            'nickname': nickname,
-            'rating': current_rating,
-            'division': self.get_user_division(nickname),
-            'tasks_score': tasks_score,
-            'best_rating': best_rating,
-            'contests': len(official_history),
-            'unofficial_contests': len([h for h in history if h.get('unofficial', False)]),
-            'last_contest': last_contest,
-            'rank': self.get_rank_title(current_rating),
-            'rank_color': self.get_rank_color(current_rating),
-            'avatar_color': self.get_avatar_color(nickname),
-            'avatar_text': nickname[:2].upper() if len(nickname) >= 2 else nickname[0].upper(),
-            'history': sorted(official_history, key=lambda x: (
-                -int(re.search(r'contest_(\d+)', x.get('contest', '')).group(1))
-                if re.search(r'contest_(\d+)', x.get('contest', '')) else 0
-            )),
-            'training_history': sorted(training_history, key=lambda x: (
-                -int(re.search(r'training_(\d+)', x.get('training', '')).group(1))
-                if re.search(r'training_(\d+)', x.get('training', '')) else 0
-            ))
-        }
+        for line in lines[start_line:]:
+            line = line.strip()
+            if not line:
+                continue
 
-    # ========== ЗАГРУЗКА И СОХРАНЕНИЕ ДАННЫХ ==========
+            match = self.CONTEST_ROW_RE.match(line)
+            if match:
+                tasks_solved_match = self.TASKS_SOLVED_RE.search(line)
+                allowed_division_match = self.ALLOWED_DIV_RE.search(line)
+                self.rows.append({
+                    'position': int(match.group(1)),
+                    'nickname': match.group(2).strip(),
+                    'old_rating': int(match.group(3)),
+                    'new_rating': int(match.group(4)),
+                    'change': int(match.group(5)),
+                    'unofficial': "[UNR]" in line or "UNRATED" in line or "unofficial" in line.lower(),
+                    'tasks_solved': int(tasks_solved_match.group(1)) if tasks_solved_match else 0,
+                    'allowed_division': int(allowed_division_match.group(1)) if allowed_division_match else None
+                })
+                continue
 
-    def load_all_data(self):
-        ratings_file = self.contestants_path / 'all_ratings.txt'
+            match = self.TRAINING_ROW_RE.match(line)
+            if match:
+                self.training_rows.append({
+                    'position': int(match.group(1)),
+                    'nickname': match.group(2).strip(),
+                    'solved': int(match.group(3))
+                })
+                continue
 
-        if ratings_file.exists():
-            try:
-                with open(ratings_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
+            match = self.TEAM_ROW_RE.match(line)
+            if match:
+                members = []
+                if '(' in line and ')' in line:
+                    members_part = line[line.find('(') + 1:line.find(')')]
+                    if 'Участники:' in members_part:
+                        members = [m.strip() for m in members_part.split('Участники:')[1].split(',')]
+                    else:
+                        members = [m.strip() for m in members_part.split(',')]
 
-                if content:
-                    self.load_ratings_from_file(ratings_file)
-                else:
-                    self.load_history_from_contests()
-                    self.recalculate_ratings_from_history()
-                    self.save_ratings()
-            except Exception as e:
-                self.load_history_from_contests()
-                self.recalculate_ratings_from_history()
-                self.save_ratings()
-        else:
-            self.load_history_from_contests()
-            self.recalculate_ratings_from_history()
-            self.save_ratings()
+                self.team_rows.append({
+                    'position': int(match.group(1)),
+                    'team_name': match.group(2).strip(),
+                    'score': int(match.group(3)),
+                    'members': members
+                })
+
+
+monitor_cache = FileVersionCache(ParsedMonitor, max_entries=512)
+change_cache = FileVersionCache(ParsedChangeFile, max_entries=1024,
+                                related=lambda path: [ParsedChangeFile.sidecar_path(path)])
+
+
+def get_parsed_monitor(monitor_file):
+    """Возвращает разобранный monitor.csv (один разбор на версию файла) или None"""
+    return monitor_cache.get(monitor_file)
+
+
+def get_parsed_change(change_file):
+    """Возвращает разобранный change.txt (один разбор на версию файла) или None"""
+    return change_cache.get(change_file)
+
+
+def backfill_change_sidecars(contests_path='contests'):
+    """Создает change.json и записывает в него sha1 monitor.csv для дивизионов, обработанных раньше.
+
+    change.txt не пересоздается: текущий monitor.csv считается тем, по которому дивизион обработан.
+    """
+    created = 0
+    skipped = 0
+
+    for change_file in sorted(Path(contests_path).glob('contest_*/div*/change.txt')):
+        sidecar = ParsedChangeFile.sidecar_path(change_file)
+        match = re.match(r'div(\d+)$', change_file.parent.name)
+        if not match:
+            skipped += 1
+            continue
+
+        try:
+            parsed = ParsedChangeFile(change_file)
+            if parsed.from_sidecar and parsed.monitor_digest:
+                skipped += 1
+                continue
+
+            ParsedChangeFile.write_sidecar(change_file, change_file.parent.parent.name, int(match.group(1)),
+                                           parsed.processed_at, parsed.total_participants,
+                                           parsed.official_participants, parsed.rows,
+                                           monitor_digest=file_digest(change_file.parent / 'monitor.csv'))
+            created += 1
+        except Exception as e:
+            print(f"Ошибка создания {sidecar}: {e}")
+            skipped += 1
+
+    change_cache.invalidate()
+    return created, skipped
+
+
+def event_number(event_id, prefix='contest'):
+    """Номер контеста/тренировки по идентификатору вида contest_N (0, если номера нет)"""
+    match = re.search(prefix + r'_(\d+)', event_id or '')
+    return int(match.group(1)) if match else 0
+
+
+def contest_dir_number(contest_dir):
+    """Номер контеста по имени папки contest_N (0, если номера нет)"""
+    return event_number(Path(contest_dir).name)
+
+
+def file_digest(path):
+    """sha1 содержимого файла (None, если файл не читается)"""
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+# Замена flock, когда файл блокировки недоступен: {путь: RLock}, действует внутри процесса
+local_file_locks = {}
+local_file_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """Эксклюзивная блокировка между процессами через fcntl.flock.
+
+    Без fcntl или если файл блокировки не открыть (read-only ФС, как на Vercel),
+    блокировка действует только между потоками текущего процесса.
+    """
+    lock_file = None
+    if fcntl is not None:
+        try:
+            lock_file = open(lock_path, 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except OSError:
+            if lock_file is not None:
+                lock_file.close()
+            lock_file = None
+
+    if lock_file is None:
+        with local_file_locks_guard:
+            local_lock = local_file_locks.setdefault(str(lock_path), threading.RLock())
+        with local_lock:
+            yield
+        return
+
+    try:
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def parse_contest_number(value):
+    """Номер контеста из 'contest_N' или просто 'N' (None, если не разобрать)"""
+    value = str(value or '').strip()
+    if value.isdigit():
+        return int(value)
+    return event_number(value) or None
+
+
+def read_contest_changes(contest_dir):
+    """Разбирает change.txt всех дивизионов контеста (выполняется в пуле процессов)"""
+    contest_dir = Path(contest_dir)
+    divisions = []
+
+    for division in range(1, 5):
+        change_file = contest_dir / f'div{division}' / 'change.txt'
+        if not change_file.exists():
+            continue
+        try:
+            parsed = ParsedChangeFile(change_file)
+            divisions.append((division, parsed.date, parsed.rows))
+        except Exception as e:
+            print(f"Ошибка чтения change.txt {change_file}: {e}")
+
+    return contest_dir.name, divisions
+
+
+# ========== ТАБЛИЦА ЛИДЕРОВ ==========
+
+class Leaderboard:
+    """Пользователи по убыванию рейтинга; при равенстве - в порядке появления"""
+
+    def __init__(self):
+        self.keys = []  # Отсортированные ключи (-рейтинг, порядковый номер, ник)
+        self.entries = {}  # {nickname: ключ}
+        self.next_seq = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rebuild(self, users):
+        """Строит таблицу заново по словарю пользователей"""
+        self.entries = {
+            nickname: (-data.get('rating', 0), seq, nickname)
+            for seq, (nickname, data) in enumerate(users.items())
+        }
+        self.keys = sorted(self.entries.values())
+        self.next_seq = len(self.entries)
+
+    def update(self, nickname, rating):
+        """Переставляет пользователя после изменения рейтинга"""
+        key = self.entries.get(nickname)
+        if key is not None:
+            if key[0] == -rating:
+                return
+            del self.keys[bisect.bisect_left(self.keys, key)]
+            seq = key[1]
+        else:
+            seq = self.next_seq
+            self.next_seq += 1
+
+        key = (-rating, seq, nickname)
+        bisect.insort(self.keys, key)
+        self.entries[nickname] = key
+
+    def top(self, k):
+        """Ники первых k пользователей"""
+        return [key[2] for key in self.keys[:k]]
+
+    def range(self, start, stop):
+        """Ники пользователей с местами start+1..stop"""
+        return [key[2] for key in self.keys[start:stop]]
+
+    def rank(self, nickname):
+        """Место пользователя (с 1) или None"""
+        key = self.entries.get(nickname)
+        if key is None:
+            return None
+        return bisect.bisect_left(self.keys, key) + 1
+
+
+# ========== КЭШ ГРАФИКОВ ==========
+
+class ChartCache:
+    """LRU готовых графиков рейтинга по (никнейм, версия истории) с необязательной копией на диске"""
+
+    STYLE_VERSION = 1  # Увеличить при изменении оформления графика, чтобы сбросить диск
+
+    def __init__(self, max_entries=256, disk_path=None):
+        self.max_entries = max_entries
+        self.disk_path = Path(disk_path) if disk_path else None
+        self._entries = OrderedDict()  # {nickname: (version, png_base64)}
+        self._lock = threading.Lock()
+
+        if self.disk_path is not None:
+            try:
+                self.disk_path.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                self.disk_path = None
+
+    def _disk_file(self, nickname):
+        # Один файл на пользователя: новая версия графика перезаписывает прежнюю
+        name = hashlib.sha1(nickname.encode('utf-8')).hexdigest()
+        return self.disk_path / f'{name}.chart'
+
+    def _disk_header(self, version):
+        """Первая строка файла: стиль и версия истории, по которым нарисован график"""
+        return f'{self.STYLE_VERSION}:{version}\n'.encode('utf-8')
+
+    def get(self, nickname, version):
+        with self._lock:
+            entry = self._entries.get(nickname)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(nickname)
+                return entry[1]
+
+        if self.disk_path is not None:
+            try:
+                with open(self._disk_file(nickname), 'rb') as f:
+                    header = f.readline()
+                    if header == self._disk_header(version):
+                        chart = base64.b64encode(f.read()).decode('utf-8')
+                        self._remember(nickname, version, chart)
+                        return chart
+            except OSError:
+                pass
+
+        return None
+
+    def put(self, nickname, version, chart):
+        self._remember(nickname, version, chart)
+
+        if self.disk_path is not None:
+            target = self._disk_file(nickname)
+            temp_file = target.with_suffix(f'.{os.getpid()}.tmp')
+            try:
+                with open(temp_file, 'wb') as f:
+                    f.write(self._disk_header(version))
+                    f.write(base64.b64decode(chart))
+                os.replace(temp_file, target)
+            except OSError as e:
+                print(f"Ошибка записи графика {target}: {e}")
+
+    def _remember(self, nickname, version, chart):
+        with self._lock:
+            self._entries[nickname] = (version, chart)
+            self._entries.move_to_end(nickname)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, nickname=None):
+        with self._lock:
+            if nickname is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(nickname, None)
+
+
+# ========== ОТРИСОВКА ГРАФИКОВ ==========
+
+class RatingChartRenderer:
+    """Рисует график рейтинга через Figure/FigureCanvasAgg без глобального состояния pyplot"""
+
+    FIGSIZE = (12, 6)
+    DPI = 100
+
+    def __init__(self):
+        # У каждого потока своя заготовка фигуры: Figure не потокобезопасна, а pyplot не нужен
+        self._local = threading.local()
+
+    def _template(self):
+        fig = getattr(self._local, 'figure', None)
+        if fig is None:
+            Figure, FigureCanvasAgg = load_matplotlib()
+            fig = Figure(figsize=self.FIGSIZE, dpi=self.DPI)
+            FigureCanvasAgg(fig)
+            fig.add_subplot(111)
+            self._local.figure = fig
+        return fig
+
+    @staticmethod
+    def _configure(ax):
+        """Общее оформление осей (после очистки заготовки)"""
+        ax.set_xlabel('Номер контеста', fontsize=12)
+        ax.set_ylabel('Рейтинг', fontsize=12)
+        ax.grid(True, alpha=0.3, linestyle='--')
+
+    def render(self, title, labels, ratings, current_label, current_color):
+        """Возвращает PNG в base64"""
+        fig = self._template()
+        ax = fig.axes[0]
+        ax.clear()
+
+        date_nums = list(range(1, len(labels) + 1))
+
+        ax.plot(date_nums, ratings, 'k-', linewidth=2, alpha=0.8)
+        ax.plot(date_nums, ratings, 'ko', markersize=4, markeredgecolor='k', markerfacecolor='k')
+
+        ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+
+        if len(date_nums) <= 30:
+            ax.set_xticks(date_nums)
+            ax.set_xticklabels(labels, rotation=45, ha='right')
+        else:
+            step = max(1, len(date_nums) // 20)
+            ax.set_xticks(date_nums[::step])
+            ax.set_xticklabels(labels[::step], rotation=45, ha='right')
+
+        self._configure(ax)
+
+        if ratings:
+            y_min = max(0, min(ratings) - 100)
+            y_max = min(4000, max(ratings) + 100)
+            ax.set_ylim([y_min, y_max])
+
+        ax.text(0.02, 0.98, current_label,
+                transform=ax.transAxes, fontsize=12, fontweight='bold',
+                verticalalignment='top', color=current_color,
+                bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.9, edgecolor='lightgray'))
+
+        fig.tight_layout()
+
+        buf = BytesIO()
+        try:
+            fig.savefig(buf, format='png', dpi=self.DPI, bbox_inches='tight')
+        finally:
+            ax.clear()
+
+        return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+class RatingSystem:
+    # Сколько записей журнала накапливается до полной перезаписи all_ratings.txt
+    JOURNAL_COMPACT_THRESHOLD = 5000
+    # Холодная пересборка истории: число процессов и минимум контестов для пула
+    HISTORY_REBUILD_WORKERS = os.cpu_count() or 1
+    HISTORY_REBUILD_MIN_CONTESTS = 8
+    # Перерисовка графиков участников после обработки контеста (PRERENDER_CHARTS=1 и CHART_CACHE_DIR)
+    PRERENDER_CHARTS = os.environ.get('PRERENDER_CHARTS') == '1'
+
+    def __init__(self, base_path, rebuild=False):
+        self.base_path = Path(base_path)
+        self.contests_path = self.base_path / 'contests'
+        self.trainings_path = self.base_path / 'trainings'
+        self.team_contests_path = self.base_path / 'team_contests'
+        self.contestants_path = self.base_path / 'contestants'
+
+        self.users = {}  # {nickname: {'rating': int, 'tasks_score': int}}
+        self.user_history = {}  # История контестов пользователя
+        self.user_training_history = {}
+        self.contest_keys = {}  # {nickname: {(contest, division)}} для проверки повторов
+        self.training_keys = {}  # {nickname: {training}}
+        self.version = 0  # Растет при каждом изменении рейтингов
+        self.journal_events = []  # Изменения, еще не записанные в журнал
+        self.journal_size = 0  # Число записей в журнале поверх all_ratings.txt
+        self.leaderboard = Leaderboard()  # Порядок пользователей по рейтингу
+        self.history_versions = {}  # {nickname: хэш официальной истории}, считается по требованию
+        self.chart_cache = ChartCache(disk_path=os.environ.get('CHART_CACHE_DIR'))
+        self.chart_renderer = RatingChartRenderer()
+        self.touched_users = set()  # Пользователи, чья история менялась с последней обработки
+        self.journal_offset = 0  # До какого байта журнал уже применен
+        self.disk_state = None  # Сигнатура файлов рейтингов, соответствующая памяти
+        self._storage_lock = threading.RLock()
+        self._storage_lock_depth = 0  # Глубина повторного входа в storage_lock
+
+        self.contests_path.mkdir(parents=True, exist_ok=True)
+        self.trainings_path.mkdir(parents=True, exist_ok=True)
+        self.team_contests_path.mkdir(parents=True, exist_ok=True)
+        self.contestants_path.mkdir(parents=True, exist_ok=True)
+
+        self.load_all_data(rebuild)
+
+    # ========== ОСНОВНЫЕ МЕТОДЫ ==========
+
+    def get_user_rating(self, nickname):
+        """Возвращает текущий рейтинг пользователя"""
+        if nickname not in self.users:
+            return 0
+        return self.users[nickname].get('rating', 0)
+
+    def get_user_division(self, nickname):
+        """Определяет дивизион пользователя по его текущему рейтингу"""
+        rating = self.get_user_rating(nickname)
+
+        if rating < 0:
+            return 4
+        elif 0 <= rating <= 999:
+            return 4
+        elif 1000 <= rating <= 1999:
+            return 3
+        elif 2000 <= rating <= 2999:
+            return 2
+        elif 3000 <= rating <= 4000:
+            return 1
+        else:
+            return 1  # Если рейтинг выше 4000 - Div1
+
+    def get_user_max_rating(self, nickname):
+        """Возвращает максимальный рейтинг пользователя из истории"""
+        if nickname not in self.user_history:
+            return self.get_user_rating(nickname)
+
+        max_rating = 0
+        for record in self.user_history[nickname]:
+            if not record.get('unofficial', False):
+                new_rating = record.get('new_rating', 0)
+                if new_rating > max_rating:
+                    max_rating = new_rating
+
+        current_rating = self.get_user_rating(nickname)
+        return max(max_rating, current_rating)
+
+    def get_user_tasks_score(self, nickname):
+        if nickname not in self.users:
+            return 0
+        return self.users[nickname].get('tasks_score', 0)
+
+    def get_rank_title(self, rating):
+        if rating < 400:
+            return "Новичок"
+        elif rating < 800:
+            return "Ученик"
+        elif rating < 1200:
+            return "Практик"
+        elif rating < 1600:
+            return "Специалист"
+        elif rating < 2000:
+            return "Эксперт"
+        elif rating < 2400:
+            return "Кандидат в мастера"
+        elif rating < 2800:
+            return "Мастер"
+        elif rating < 3200:
+            return "Грандмастер"
+        elif rating < 3600:
+            return "Легендарный мастер"
+        else:
+            return "Абсолютный мастер"
+
+    def get_rank_color(self, rating):
+        if rating < 400:
+            return "#804000"
+        elif rating < 800:
+            return "#808080"
+        elif rating < 1200:
+            return "#008000"
+        elif rating < 1600:
+            return "#00C0C0"
+        elif rating < 2000:
+            return "#0000FF"
+        elif rating < 2400:
+            return "#AA00AA"
+        elif rating < 2800:
+            return "#C0C000"
+        elif rating < 3200:
+            return "#FF8000"
+        elif rating < 3600:
+            return "#FF0000"
+        else:
+            return "#FF0066"
+
+    def get_avatar_color(self, nickname):
+        hash_val = sum(ord(c) for c in nickname) % 360
+        return f'hsl({hash_val}, 70%, 60%)'
+
+    def get_user_stats(self, nickname):
+        """Возвращает статистику пользователя"""
+        if nickname not in self.users:
+            return None
+
+        current_rating = self.get_user_rating(nickname)
+        tasks_score = self.get_user_tasks_score(nickname)
+        history = self.user_history.get(nickname, [])
+        training_history = self.user_training_history.get(nickname, [])
+
+        official_history = [h for h in history if not h.get('unofficial', False)]
+
+        best_rating = self.get_user_max_rating(nickname)
+
+        # Номера контестов посчитаны при добавлении записей, здесь только сортировка по int
+        sorted_history = sorted(official_history, key=lambda x: -x['contest_number'])
+
+        last_contest = "Нет"
+        if official_history:
+            last_contest = sorted_history[0]['contest'].replace('contest_', '')
+
+        return {
+            'nickname': nickname,
+            'rating': current_rating,
+            'division': self.get_user_division(nickname),
+            'tasks_score': tasks_score,
+            'best_rating': best_rating,
+            'contests': len(official_history),
+            'unofficial_contests': len([h for h in history if h.get('unofficial', False)]),
+            'last_contest': last_contest,
+            'rank': self.get_rank_title(current_rating),
+            'rank_color': self.get_rank_color(current_rating),
+            'avatar_color': self.get_avatar_color(nickname),
+            'avatar_text': nickname[:2].upper() if len(nickname) >= 2 else nickname[0].upper(),
+            'history': sorted_history,
+            'training_history': sorted(training_history, key=lambda x: -x['training_number'])
+        }
+
+    # ========== ЗАГРУЗКА И СОХРАНЕНИЕ ДАННЫХ ==========
+
+    def load_all_data(self, rebuild=False):
+        if not rebuild:
+            # Готовый снимок читается без файла блокировки, как и в refresh_from_disk:
+            # на read-only ФС (Vercel) all_ratings.lock не создать
+            with self._storage_lock:
+                loaded = self.load_snapshot()
+            if loaded:
+                self.leaderboard.rebuild(self.users)
+                return
+
+        # Пересборка - под блокировкой: при одновременном старте воркеров ее делает только первый,
+        # остальные дожидаются его и читают уже записанный снимок
+        with self.storage_lock():
+            if rebuild or not self.load_snapshot():
+                # Явная пересборка из CLI разбирает change.txt в пуле процессов
+                self.load_history_from_contests(parallel=rebuild)
+                self.recalculate_ratings_from_history()
+                self.compact_ratings()
+
+        self.leaderboard.rebuild(self.users)
+
+    def load_snapshot(self):
+        """Читает all_ratings.txt и журнал; False, если снимка нет и рейтинги нужно пересобрать"""
+        ratings_file = self.contestants_path / 'all_ratings.txt'
+        journal_file = self.contestants_path / 'all_ratings.journal'
+
+        # Сигнатура снимается до чтения: изменение во время чтения заметит следующая проверка
+        signature = self.disk_signature()
+        if not ratings_file.exists():
+            return False
+
+        try:
+            with open(ratings_file, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+
+            if not content and not journal_file.exists():
+                return False
+
+            self.load_ratings_from_file(ratings_file)
+            self.load_journal()
+            self.disk_state = signature
+            return True
+        except Exception:
+            return False
 
     def load_ratings_from_file(self, ratings_file):
         try:
@@ -3643,8 +4668,162 @@ class RatingSystem:
             self.user_history = {}
             self.user_training_history = {}
 
-    def save_ratings(self):
+        self.rebuild_history_index()
+
+    def rebuild_history_index(self):
+        """Строит индекс обработанных (контест, дивизион) и тренировок по истории"""
+        for history in self.user_history.values():
+            for record in history:
+                record['contest_number'] = event_number(record.get('contest'))
+        for history in self.user_training_history.values():
+            for record in history:
+                record['training_number'] = event_number(record.get('training'), 'training')
+
+        self.history_versions = {}
+        self.chart_cache.invalidate()
+
+        self.contest_keys = {
+            nickname: {(record.get('contest'), record.get('division')) for record in history}
+            for nickname, history in self.user_history.items()
+        }
+        self.training_keys = {
+            nickname: {record.get('training') for record in history}
+            for nickname, history in self.user_training_history.items()
+        }
+
+    def has_contest_record(self, nickname, contest_id, division):
+        return (contest_id, division) in self.contest_keys.get(nickname, ())
+
+    def add_contest_record(self, nickname, record):
+        record['contest_number'] = event_number(record.get('contest'))
+        self.user_history.setdefault(nickname, []).append(record)
+        self.history_versions.pop(nickname, None)
+        self.chart_cache.invalidate(nickname)
+        self.touched_users.add(nickname)
+        self.contest_keys.setdefault(nickname, set()).add((record.get('contest'), record.get('division')))
+
+    def has_training_record(self, nickname, training_id):
+        return training_id in self.training_keys.get(nickname, ())
+
+    def add_training_record(self, nickname, record):
+        record['training_number'] = event_number(record.get('training'), 'training')
+        self.user_training_history.setdefault(nickname, []).append(record)
+        self.training_keys.setdefault(nickname, set()).add(record.get('training'))
+
+    def load_journal(self, offset=0):
+        """Применяет журнал изменений поверх загруженного all_ratings.txt, начиная с байта offset"""
+        journal_file = self.contestants_path / 'all_ratings.journal'
+        if offset == 0:
+            self.journal_size = 0
+        self.journal_offset = offset
+        if not journal_file.exists():
+            return
+
+        try:
+            with open(journal_file, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except Exception as e:
+            print(f"Ошибка чтения журнала рейтингов: {e}")
+            return
+
+        # Строка без перевода строки еще дописывается другим процессом - ее дочитаем позже
+        end = data.rfind(b'\n') + 1
+        self.journal_offset = offset + end
+
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except:
+                # Недописанная строка после сбоя
+                continue
+            self.apply_journal_event(event)
+            self.journal_size += len(event['events']) if 'events' in event else 1
+
+    def apply_journal_event(self, event):
+        """Применяет одну запись журнала; повторное применение ничего не меняет"""
+        if 'events' in event:
+            # Пакет обработки диапазона контестов: одна строка журнала, применяется целиком
+            for item in event['events']:
+                self.apply_journal_event(item)
+            return
+
+        nickname = event['nickname']
+
+        record = event.get('contest_record')
+        if record is not None:
+            if self.has_contest_record(nickname, record['contest'], record['division']):
+                return
+            self.add_contest_record(nickname, record)
+
+        record = event.get('training_record')
+        if record is not None:
+            if self.has_training_record(nickname, record.get('training')):
+                return
+            self.add_training_record(nickname, record)
+
+        user = event.get('user')
+        if user is not None:
+            self.users[nickname] = {
+                'rating': int(user.get('rating', 0)),
+                'tasks_score': int(user.get('tasks_score', 0))
+            }
+
+    def record_journal_event(self, nickname, **records):
+        """Запоминает изменение пользователя для следующего save_ratings"""
+        user = self.users.get(nickname)
+        event = {'nickname': nickname, 'user': dict(user) if user is not None else None}
+        event.update(records)
+        self.journal_events.append(event)
+
+    def save_ratings(self, batch=False):
+        """Дописывает накопленные изменения в журнал; при переполнении сжимает его.
+
+        batch=True пишет все изменения одной строкой: после сбоя они не применятся частично.
+        """
+        self.version += 1
+
+        if not self.journal_events:
+            return
+
         ratings_file = self.contestants_path / 'all_ratings.txt'
+        journal_file = self.contestants_path / 'all_ratings.journal'
+
+        with self.storage_lock():
+            if not ratings_file.exists() or self.journal_size + len(self.journal_events) > self.JOURNAL_COMPACT_THRESHOLD:
+                self.compact_ratings()
+                return
+
+            try:
+                if batch:
+                    lines = [json.dumps({'events': self.journal_events}, ensure_ascii=False) + '\n']
+                else:
+                    lines = [json.dumps(event, ensure_ascii=False) + '\n' for event in self.journal_events]
+                with open(journal_file, 'ab') as f:
+                    # Хвост без перевода строки (сбой при записи) не должен склеиться с новой записью
+                    if f.tell() > self.journal_offset:
+                        f.write(b'\n')
+                    f.write(''.join(lines).encode('utf-8'))
+                    self.journal_offset = f.tell()
+                self.journal_size += len(self.journal_events)
+                self.journal_events = []
+                self.disk_state = self.disk_signature()
+            except Exception as e:
+                print(f"Ошибка записи журнала рейтингов: {e}")
+                self.compact_ratings()
+
+    def compact_ratings(self):
+        """Полностью перезаписывает all_ratings.txt и очищает журнал"""
+        with self.storage_lock():
+            self._compact_ratings()
+
+    def _compact_ratings(self):
+        ratings_file = self.contestants_path / 'all_ratings.txt'
+        journal_file = self.contestants_path / 'all_ratings.journal'
+        self.version += 1
         try:
             temp_file = ratings_file.with_suffix('.tmp')
 
@@ -3666,17 +4845,114 @@ class RatingSystem:
                     json_str = json.dumps(user_info, ensure_ascii=False)
                     f.write(f"{nickname}: {json_str}\n")
 
-            if temp_file.exists():
-                if ratings_file.exists():
-                    ratings_file.unlink()
-                temp_file.rename(ratings_file)
+            # os.replace атомарен: читатели видят либо старый, либо новый файл целиком
+            os.replace(temp_file, ratings_file)
+
+            if journal_file.exists():
+                journal_file.unlink()
+            self.journal_size = 0
+            self.journal_offset = 0
+            self.journal_events = []
+            self.disk_state = self.disk_signature()
         except Exception as e:
             print(f"Ошибка сохранения рейтингов: {e}")
 
+    # ========== СИНХРОНИЗАЦИЯ МЕЖДУ ПРОЦЕССАМИ ==========
+
+    @contextlib.contextmanager
+    def storage_lock(self):
+        """Эксклюзивный доступ к файлам рейтингов для потоков и процессов (воркеров gunicorn)"""
+        with self._storage_lock:
+            self._storage_lock_depth += 1
+            try:
+                if self._storage_lock_depth > 1:
+                    # Повторный вход в том же потоке: файловая блокировка уже взята
+                    yield
+                else:
+                    with file_lock(self.contestants_path / 'all_ratings.lock'):
+                        yield
+            finally:
+                self._storage_lock_depth -= 1
+
+    def disk_signature(self):
+        """Дешевая версия файлов рейтингов: inode, размер и mtime без чтения содержимого"""
+        signature = []
+        for name in ('all_ratings.txt', 'all_ratings.journal'):
+            try:
+                st = os.stat(self.contestants_path / name)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def refresh_from_disk(self):
+        """Подхватывает изменения, записанные другими процессами; True, если память обновлена"""
+        if self.disk_state is None:
+            return False
+        # Если этот процесс сам сейчас обрабатывает контест, его память и так актуальна
+        if not self._storage_lock.acquire(blocking=False):
+            return False
+        try:
+            signature = self.disk_signature()
+            if signature == self.disk_state:
+                return False
+
+            ratings, journal = signature
+            if ratings is None:
+                # Файл рейтингов пропал - данные в памяти не трогаем
+                self.disk_state = signature
+                return False
+
+            if ratings == self.disk_state[0] and journal is not None and journal[1] >= self.journal_offset:
+                # all_ratings.txt прежний - дочитываем только новые записи журнала
+                self.load_journal(self.journal_offset)
+                self.disk_state = signature
+                self.leaderboard.rebuild(self.users)
+                self.version += 1
+            else:
+                # Другой процесс сжал журнал в новый all_ratings.txt
+                self.reload_from_disk()
+            return True
+        finally:
+            self._storage_lock.release()
+
+    def reload_from_disk(self):
+        """Перечитывает рейтинги с диска, отбрасывая несохраненные изменения в памяти"""
+        signature = self.disk_signature()
+        self.journal_events = []
+        self.load_ratings_from_file(self.contestants_path / 'all_ratings.txt')
+        self.load_journal()
+        self.disk_state = signature
+        self.leaderboard.rebuild(self.users)
+        self.version += 1
+
     # ========== ГЕНЕРАЦИЯ ФАЙЛОВ ИЗМЕНЕНИЙ ==========
 
-    def generate_change_file(self, contest_dir, division):
-        """Генерирует change.txt для дивизиона контеста"""
+    def monitor_status(self, contest_dir, division):
+        """Сравнивает monitor.csv с тем, по которому дивизион обработан.
+
+        Возвращает (статус, текущий sha1): 'new' - еще не обработан, 'unchanged' - файл тот же,
+        'changed' - файл исправлен после обработки, 'unknown' - обработан до учета хэшей
+        (хэш записывает flask backfill-sidecars). Пересчитывать можно только 'new'.
+        """
+        division_dir = contest_dir / f'div{division}'
+        digest = file_digest(division_dir / 'monitor.csv')
+        change_file = division_dir / 'change.txt'
+        if not change_file.exists():
+            return 'new', digest
+
+        parsed = get_parsed_change(change_file)
+        recorded = parsed.monitor_digest if parsed else None
+        if recorded is None:
+            return 'unknown', digest
+        return ('unchanged' if recorded == digest else 'changed'), digest
+
+    def generate_change_file(self, contest_dir, division, progress=None, staged=None):
+        """Генерирует change.txt для дивизиона контеста; progress(**поля) получает ход обработки.
+
+        Если передан список staged, файлы пишутся во временные и добавляются в него парами
+        (временный, итоговый), а рейтинги не сохраняются - это делает вызывающий код.
+        """
         contest_id = contest_dir.name
         division_dir = contest_dir / f'div{division}'
 
@@ -3689,95 +4965,61 @@ class RatingSystem:
         if not monitor_file.exists():
             return False, f"Файл monitor.csv не найден в div{division}"
 
-        try:
-            participants = []
-
-            # Сначала читаем всех участников из монитора
-            with open(monitor_file, 'r', encoding='utf-8') as f:
-                sample = f.read(1024)
-                f.seek(0)
-
-                if ';' in sample:
-                    reader = csv.DictReader(f, delimiter=';')
-                else:
-                    reader = csv.DictReader(f)
+        self.recover_staged_files(contest_dir, division)
 
-                for i, row in enumerate(reader):
-                    nickname = row.get('user_name', '') or row.get('login', '') or row.get('Участник', '')
-                    if nickname and nickname.strip():
-                        nickname = nickname.strip()
+        # Повторная обработка того же monitor.csv ничего не меняет - выходим без разбора
+        status, monitor_digest = self.monitor_status(contest_dir, division)
+        if status == 'unchanged':
+            return True, f"{contest_id}, Div {division} уже обработан, monitor.csv не изменился"
+        if status == 'unknown':
+            # Пересчет от уже обновленных рейтингов испортил бы замороженные изменения в change.txt
+            return True, (f"{contest_id}, Div {division} уже обработан (хэш monitor.csv не записан, "
+                          f"выполните flask backfill-sidecars)")
+        if status == 'changed':
+            return False, (f"monitor.csv в {contest_id}, Div {division} изменился после обработки; "
+                           f"рейтинги не пересчитываются автоматически")
 
-                        score_str = row.get('Score', '0') or row.get('score', '0') or row.get('Баллы', '0')
-                        try:
-                            score = float(score_str)
-                        except:
-                            score = 0
-
-                        tasks_solved = 0
-                        for key, value in row.items():
-                            if key.lower() not in ['place', 'user_name', 'login', 'Участник', 'участник',
-                                                   'Score', 'Penalty', 'score', 'penalty', 'Баллы', 'баллы',
-                                                   'user', 'User', 'USER', 'фио', 'ФИО']:
-                                if value and ('+' in str(value) or str(value).isdigit() and int(value) > 0):
-                                    tasks_solved += 1
-
-                        # Получаем текущий рейтинг пользователя
-                        current_rating = self.get_user_rating(nickname)
-
-                        # Определяем разрешенный дивизион пользователя
-                        allowed_division = self.get_user_division(nickname)
-
-                        # Определяем unofficial статус
-                        # Участник официальный ТОЛЬКО если пишет в своем allowed_division
-                        unofficial = (division != allowed_division)
-
-                        participants.append({
-                            'nickname': nickname,
-                            'score': score,
-                            'tasks_solved': tasks_solved,
-                            'rating': current_rating,
-                            'unofficial': unofficial,
-                            'allowed_division': allowed_division,
-                            'current_division': division
-                        })
+        try:
+            # Таблица результатов по разобранному монитору
+            all_participants_sorted, total_official = self.compute_division_results(
+                get_parsed_monitor(monitor_file), division)
 
-            if not participants:
+            if not all_participants_sorted:
                 return False, f"Нет участников в monitor.csv для Div {division}"
 
-            participants.sort(key=lambda x: x['score'], reverse=True)
+            if progress:
+                progress(division=division, stage='change_file', rows_processed=0,
+                         rows_total=len(all_participants_sorted))
 
-            # Только официальные участники для подсчета рейтинга
-            official_participants = [p for p in participants if not p['unofficial']]
-            total_official = len(official_participants)
+            processed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-            with open(change_file, 'w', encoding='utf-8') as f:
+            change_target = change_file
+            sidecar_target = ParsedChangeFile.sidecar_path(change_file)
+            if staged is not None:
+                change_target = change_file.with_name('change.txt.tmp')
+                sidecar_target = sidecar_target.with_name('change.json.tmp')
+                # Порядок важен: change.json должен появиться не раньше change.txt
+                staged.append((change_target, change_file))
+                staged.append((sidecar_target, ParsedChangeFile.sidecar_path(change_file)))
+
+            with open(change_target, 'w', encoding='utf-8') as f:
                 f.write(f"Контест: {contest_id}\n")
                 f.write(f"Дивизион: {division}\n")
-                f.write(f"Дата обработки: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Участников всего: {len(participants)}\n")
+                f.write(f"Дата обработки: {processed_at}\n")
+                f.write(f"Участников всего: {len(all_participants_sorted)}\n")
                 f.write(f"Участников официально: {total_official}\n")
-                f.write(f"Unofficial участников: {len(participants) - total_official}\n")
+                f.write(f"Unofficial участников: {len(all_participants_sorted) - total_official}\n")
                 f.write("=" * 60 + "\n")
 
-                all_participants_sorted = sorted(participants, key=lambda x: x['score'], reverse=True)
-
-                official_counter = 0
                 for i, participant in enumerate(all_participants_sorted):
                     nickname = participant['nickname']
-                    old_rating = participant['rating']
+                    old_rating = participant['old_rating']
+                    new_rating = participant['new_rating']
+                    delta = participant['change']
                     unofficial = participant['unofficial']
                     tasks_solved = participant['tasks_solved']
                     allowed_division = participant['allowed_division']
-
-                    if unofficial:
-                        delta = 0
-                        new_rating = old_rating
-                        status = "UNRATED"
-                    else:
-                        official_counter += 1
-                        delta = self.calculate_rating_change(official_counter, total_official, old_rating, tasks_solved)
-                        new_rating = max(0, old_rating + delta)
-                        status = "RATED"
+                    status = "UNRATED" if unofficial else "RATED"
 
                     rank_old = self.get_rank_title(old_rating)
                     rank_new = self.get_rank_title(new_rating)
@@ -3792,11 +5034,19 @@ class RatingSystem:
                     f.write(f"{i + 1:3d}. {nickname}: {old_rating:4d} ({rank_old}) → "
                             f"{new_rating:4d} ({rank_new}) ({delta:+d}) {status}{tasks_info}{debug_info}\n")
 
+            # Машиночитаемая копия результатов; пишется после change.txt, чтобы не быть старше его
+            ParsedChangeFile.write_sidecar(change_file, contest_id, division, processed_at,
+                                           len(all_participants_sorted), total_official, all_participants_sorted,
+                                           path=sidecar_target, monitor_digest=monitor_digest)
+            if staged is None:
+                change_cache.invalidate(change_file)
+
             # Обновляем рейтинги участников
-            official_counter = 0
             for i, participant in enumerate(all_participants_sorted):
                 nickname = participant['nickname']
-                old_rating = participant['rating']
+                old_rating = participant['old_rating']
+                new_rating = participant['new_rating']
+                delta = participant['change']
                 unofficial = participant['unofficial']
                 tasks_solved = participant['tasks_solved']
                 allowed_division = participant['allowed_division']
@@ -3804,23 +5054,11 @@ class RatingSystem:
                 if nickname not in self.user_history:
                     self.user_history[nickname] = []
 
-                already_processed = False
-                for record in self.user_history[nickname]:
-                    if record['contest'] == contest_id and record['division'] == division:
-                        already_processed = True
-                        break
+                already_processed = self.has_contest_record(nickname, contest_id, division)
 
                 if not already_processed:
-                    if unofficial:
-                        delta = 0
-                        new_rating = old_rating
-                    else:
-                        official_counter += 1
-                        delta = self.calculate_rating_change(official_counter, total_official, old_rating, tasks_solved)
-                        new_rating = max(0, old_rating + delta)
-
                     # Сохраняем историю контеста
-                    self.user_history[nickname].append({
+                    record = {
                         'contest': contest_id,
                         'division': division,
                         'position': i + 1,
@@ -3832,7 +5070,8 @@ class RatingSystem:
                         'allowed_division': allowed_division,
                         'date': datetime.now().strftime("%Y-%m-%d"),
                         'type': 'contest'
-                    })
+                    }
+                    self.add_contest_record(nickname, record)
 
                     # Обновляем рейтинг только если участник официальный
                     if not unofficial:
@@ -3846,6 +5085,19 @@ class RatingSystem:
                         # Обновляем счетчик решенных задач
                         self.users[nickname]['tasks_score'] = self.users[nickname].get('tasks_score', 0) + tasks_solved
 
+                        self.leaderboard.update(nickname, new_rating)
+
+                    self.record_journal_event(nickname, contest_record=record)
+
+                if progress:
+                    progress(division=division, stage='ratings', rows_processed=i + 1,
+                             rows_total=len(all_participants_sorted))
+
+            if staged is not None:
+                return True, f"Рассчитан {contest_id}, Div {division}"
+
+            if progress:
+                progress(division=division, stage='saving')
             self.save_ratings()
 
             return True, f"Файл change.txt успешно создан для {contest_id}, Div {division}"
@@ -3853,6 +5105,97 @@ class RatingSystem:
             import traceback
             return False, f"Ошибка генерации change.txt: {str(e)}\n{traceback.format_exc()}"
 
+    def compute_division_results(self, monitor, division):
+        """Считает таблицу дивизиона в памяти: места, официальность и изменения рейтинга.
+
+        Возвращает (строки по убыванию баллов, число официальных участников); ничего не меняет.
+        """
+        participants = []
+        for nickname, score, tasks_solved in monitor.scores():
+            # Участник официальный ТОЛЬКО если пишет в своем allowed_division
+            allowed_division = self.get_user_division(nickname)
+            participants.append({
+                'nickname': nickname,
+                'score': score,
+                'tasks_solved': tasks_solved,
+                'rating': self.get_user_rating(nickname),
+                'unofficial': division != allowed_division,
+                'allowed_division': allowed_division
+            })
+
+        participants.sort(key=lambda x: x['score'], reverse=True)
+
+        # Только официальные участники для подсчета рейтинга
+        official_participants = [p for p in participants if not p['unofficial']]
+        total_official = len(official_participants)
+
+        # Изменения рейтинга всех официальных участников одним пакетом
+        deltas = self.calculate_rating_changes(
+            range(1, total_official + 1),
+            total_official,
+            [p['rating'] for p in official_participants],
+            [p['tasks_solved'] for p in official_participants])
+
+        rows = []
+        official_counter = 0
+        for i, participant in enumerate(participants):
+            old_rating = participant['rating']
+            if participant['unofficial']:
+                delta = 0
+                new_rating = old_rating
+            else:
+                delta = deltas[official_counter]
+                official_counter += 1
+                new_rating = max(0, old_rating + delta)
+
+            rows.append({
+                'position': i + 1,
+                'nickname': participant['nickname'],
+                'score': participant['score'],
+                'old_rating': old_rating,
+                'new_rating': new_rating,
+                'change': delta,
+                'unofficial': participant['unofficial'],
+                'tasks_solved': participant['tasks_solved'],
+                'allowed_division': participant['allowed_division']
+            })
+
+        return rows, total_official
+
+    def preview_division(self, contest_id, division):
+        """Пробный расчет дивизиона: та же таблица, что при обработке, без записи файлов и рейтингов"""
+        division_dir = self.contests_path / contest_id / f'div{division}'
+        monitor_file = division_dir / 'monitor.csv'
+
+        if not (self.contests_path / contest_id).exists():
+            return False, "Контест не найден"
+        if not monitor_file.exists():
+            return False, f"Файл monitor.csv не найден в div{division}"
+
+        try:
+            rows, total_official = self.compute_division_results(get_parsed_monitor(monitor_file), division)
+        except Exception as e:
+            return False, f"Ошибка расчета: {e}"
+
+        if not rows:
+            return False, f"Нет участников в monitor.csv для Div {division}"
+
+        for row in rows:
+            row['old_rank'] = self.get_rank_title(row['old_rating'])
+            row['new_rank'] = self.get_rank_title(row['new_rating'])
+            row['already_processed'] = self.has_contest_record(row['nickname'], contest_id, division)
+
+        return True, {
+            'contest': contest_id,
+            'division': division,
+            'already_processed': (division_dir / 'change.txt').exists(),
+            'monitor_status': self.monitor_status(self.contests_path / contest_id, division)[0],
+            'total_participants': len(rows),
+            'official_participants': total_official,
+            'unofficial_participants': len(rows) - total_official,
+            'participants': rows
+        }
+
     # ========== РАСЧЕТ ИЗМЕНЕНИЯ РЕЙТИНГА ==========
 
     def calculate_rating_change(self, place, total_participants, old_rating, tasks_solved=0):
@@ -3911,48 +5254,281 @@ class RatingSystem:
 
         return int(round(delta))
 
+    # Пороги процентиля и ожидаемый перформанс, как в calculate_rating_change
+    PERCENTILE_THRESHOLDS = [99, 90, 80, 70, 60, 50, 40, 30, 20, 10]
+    EXPECTED_PERFORMANCE = [2400, 2100, 1900, 1700, 1500, 1350, 1200, 1050, 900, 750]
+
+    def calculate_rating_changes(self, places, total_participants, old_ratings, tasks_solved):
+        """Пакетный calculate_rating_change для всего дивизиона за один проход NumPy"""
+        import numpy as np  # Нужен только при обработке, не при запуске
+
+        if total_participants <= 1:
+            return [0] * len(places)
+        if not len(places):
+            return []
+
+        places = np.asarray(places, dtype=np.int64)
+        old_ratings = np.asarray(old_ratings, dtype=np.int64)
+        tasks_solved = np.asarray(tasks_solved, dtype=np.int64)
+
+        percentile = 100 * (total_participants - places) / total_participants
+
+        expected_performance = np.select(
+            [percentile >= threshold for threshold in self.PERCENTILE_THRESHOLDS],
+            self.EXPECTED_PERFORMANCE,
+            default=600)
+
+        task_bonus = tasks_solved * 25
+
+        delta = np.where(old_ratings == 0,
+                         (expected_performance + task_bonus - 1000) * 0.5,
+                         (expected_performance + task_bonus - old_ratings) * 0.2)
+
+        delta = np.clip(delta, -400, 400)
+
+        delta = np.select(
+            [(places == 1) & (delta < 150),
+             (places <= 3) & (delta < 100),
+             (places <= total_participants * 0.1) & (delta < 50)],
+            [150, 100, 50],
+            default=delta)
+
+        delta = np.select(
+            [(places >= total_participants * 0.9) & (delta > -50),
+             (places == total_participants) & (delta > -100)],
+            [-50, -100],
+            default=delta)
+
+        # np.rint, как и round, округляет половины к четному
+        return [int(value) for value in np.rint(delta)]
+
     # ========== ОБРАБОТКА КОНТЕСТОВ ==========
 
-    def process_division(self, contest_id, division):
+    def process_division(self, contest_id, division, progress=None):
         contest_dir = self.contests_path / contest_id
         if not contest_dir.exists():
             return False, "Контест не найден"
 
-        success, message = self.generate_change_file(contest_dir, division)
+        with self.storage_lock():
+            # Считаем от рейтингов, сохраненных другими воркерами
+            self.refresh_from_disk()
+            success, message = self.generate_change_file(contest_dir, division, progress)
         return success, message
 
-    def process_all_divisions(self, contest_id):
+    def process_all_divisions(self, contest_id, progress=None):
         contest_dir = self.contests_path / contest_id
         if not contest_dir.exists():
             return False, "Контест не найден"
 
+        with self.storage_lock():
+            self.refresh_from_disk()
+            return self._process_all_divisions(contest_dir, progress)
+
+    def _process_all_divisions(self, contest_dir, progress):
+        self.touched_users = set()
         results = []
         for division in range(1, 5):
             division_dir = contest_dir / f'div{division}'
             if division_dir.exists():
                 monitor_file = division_dir / 'monitor.csv'
                 if monitor_file.exists():
-                    success, message = self.generate_change_file(contest_dir, division)
+                    self.recover_staged_files(contest_dir, division)
+                    status = self.monitor_status(contest_dir, division)[0]
+                    if status == 'unchanged':
+                        results.append(f"Div {division}: Без изменений")
+                        continue
+                    if status == 'unknown':
+                        results.append(f"Div {division}: Уже обработан")
+                        continue
+                    success, message = self.generate_change_file(contest_dir, division, progress)
                     if success:
                         results.append(f"Div {division}: Успешно")
                     else:
                         results.append(f"Div {division}: Ошибка - {message}")
 
+        if self.PRERENDER_CHARTS and self.touched_users:
+            self.schedule_chart_prerender(self.touched_users)
+        self.touched_users = set()
+
         if results:
             return True, f"Обработаны дивизионы:\n" + "\n".join(results)
         else:
             return False, "Нет данных для обработки"
 
+    def process_contest_range(self, first, last, progress=None):
+        """Обрабатывает контесты с номерами first..last по порядку и сохраняет все одним коммитом.
+
+        Рейтинги между контестами живут в памяти; при любой ошибке не меняются ни рейтинги,
+        ни файлы change.txt/change.json.
+        """
+        first_number, last_number = parse_contest_number(first), parse_contest_number(last)
+        if first_number is None or last_number is None or first_number > last_number:
+            return False, "Неверный диапазон контестов"
+
+        contest_dirs = sorted(
+            (d for d in self.contests_path.glob('contest_*')
+             if d.is_dir() and first_number <= contest_dir_number(d) <= last_number),
+            key=contest_dir_number)
+        if not contest_dirs:
+            return False, "В диапазоне нет контестов"
+
+        with self.storage_lock():
+            self.refresh_from_disk()
+            self.touched_users = set()
+            staged = []
+            results = []
+
+            try:
+                for contest_dir in contest_dirs:
+                    divisions = []
+                    for division in range(1, 5):
+                        if not (contest_dir / f'div{division}' / 'monitor.csv').exists():
+                            continue
+                        self.recover_staged_files(contest_dir, division)
+                        status = self.monitor_status(contest_dir, division)[0]
+                        if status in ('unchanged', 'unknown'):
+                            divisions.append(f"{division} (без изменений)" if status == 'unchanged'
+                                             else f"{division} (уже обработан)")
+                            continue
+                        if progress:
+                            progress(contest=contest_dir.name)
+                        success, message = self.generate_change_file(contest_dir, division, progress, staged)
+                        if not success:
+                            raise RuntimeError(f"{contest_dir.name}, Div {division}: {message}")
+                        divisions.append(str(division))
+                    if divisions:
+                        results.append(f"{contest_dir.name}: Div {', '.join(divisions)}")
+
+                if not results:
+                    raise RuntimeError("Нет данных для обработки")
+
+                # Точка коммита - запись рейтингов одной строкой журнала (или атомарное сжатие)
+                if progress:
+                    progress(stage='saving')
+                self.save_ratings(batch=True)
+                if self.journal_events:
+                    raise RuntimeError("Не удалось сохранить рейтинги")
+            except Exception as e:
+                for temp_file, _ in staged:
+                    if temp_file.exists():
+                        temp_file.unlink()
+                self.reload_from_disk()
+                self.touched_users = set()
+                return False, f"Обработка диапазона отменена: {e}"
+
+            # Рейтинги уже сохранены - откат невозможен. Файлы переносятся по дивизионам:
+            # change.json только после своего change.txt; что не перенеслось, доделает
+            # recover_staged_files при следующей обработке
+            failed = []
+            for (change_temp, change_target), (sidecar_temp, sidecar_target) in zip(staged[::2], staged[1::2]):
+                try:
+                    os.replace(change_temp, change_target)
+                    os.replace(sidecar_temp, sidecar_target)
+                except OSError as e:
+                    failed.append(f"{change_target.parent}: {e}")
+                change_cache.invalidate(change_target)
+
+            # Данные графиков снимаются, пока история не может измениться
+            if self.PRERENDER_CHARTS and self.touched_users:
+                self.schedule_chart_prerender(self.touched_users)
+            self.touched_users = set()
+
+        if failed:
+            return False, ("Рейтинги сохранены, но не все файлы изменений перенесены на место "
+                           "(повторная обработка диапазона их восстановит):\n" + "\n".join(failed))
+        return True, f"Обработано контестов: {len(results)}\n" + "\n".join(results)
+
+    def recover_staged_files(self, contest_dir, division):
+        """Доводит или убирает change.txt.tmp/change.json.tmp, оставшиеся от пакетной обработки.
+
+        Если рейтинги пакета сохранены (в истории есть записи дивизиона), файлы переносятся
+        на место; иначе это остатки отмененного пакета. Вызывается под storage_lock.
+        """
+        division_dir = contest_dir / f'div{division}'
+        change_file = division_dir / 'change.txt'
+        change_temp = division_dir / 'change.txt.tmp'
+        sidecar_temp = division_dir / 'change.json.tmp'
+        if not change_temp.exists() and not sidecar_temp.exists():
+            return False
+
+        committed = False
+        try:
+            with open(sidecar_temp, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            nickname_column = data['columns'].index('nickname')
+            committed = any(self.has_contest_record(row[nickname_column], contest_dir.name, division)
+                            for row in data['rows'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        try:
+            if committed:
+                if change_temp.exists():
+                    os.replace(change_temp, change_file)
+                os.replace(sidecar_temp, ParsedChangeFile.sidecar_path(change_file))
+                change_cache.invalidate(change_file)
+            else:
+                for temp_file in (change_temp, sidecar_temp):
+                    if temp_file.exists():
+                        temp_file.unlink()
+        except OSError as e:
+            print(f"Ошибка восстановления файлов изменений в {division_dir}: {e}")
+            return False
+        return committed
+
+    def schedule_chart_prerender(self, nicknames):
+        """Запускает перерисовку графиков в фоне, не задерживая ответ на обработку.
+
+        Вызывается под storage_lock: данные графиков снимаются сразу, и фоновый поток
+        больше не читает историю, которую может менять следующее задание.
+        Без общего каталога CHART_CACHE_DIR графики остались бы в памяти одного воркера,
+        поэтому тогда ничего не делаем. Графиков берется не больше, чем вмещает LRU, -
+        сначала пользователи с наибольшим рейтингом.
+        """
+        if self.chart_cache.disk_path is None:
+            return None
+
+        nicknames = sorted(nicknames, key=lambda nickname: -self.get_user_rating(nickname))
+        jobs = self.collect_chart_jobs(nicknames[:self.chart_cache.max_entries])
+        if not jobs:
+            return None
+
+        thread = threading.Thread(target=self.prerender_charts, args=(jobs,), daemon=True)
+        thread.start()
+        return thread
+
+    def collect_chart_jobs(self, nicknames):
+        """[(никнейм, версия истории, аргументы RatingChartRenderer.render)] для пользователей с графиком"""
+        jobs = []
+        for nickname in sorted(nicknames):
+            arguments = self.chart_arguments(nickname)
+            if arguments is not None:
+                jobs.append((nickname, self.get_history_version(nickname), arguments))
+        return jobs
+
+    def prerender_charts(self, jobs):
+        """Рисует снятые графики в текущем потоке и кладет их в кэш графиков"""
+        rendered = 0
+        for nickname, version, arguments in jobs:
+            chart = self.chart_renderer.render(*arguments)
+            if chart:
+                self.chart_cache.put(nickname, version, chart)
+                rendered += 1
+        return rendered
+
     # ========== ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ ==========
 
-    def load_history_from_contests(self):
-        for contest_dir in self.contests_path.glob('contest_*'):
-            if contest_dir.is_dir():
-                for division in range(1, 5):
-                    division_dir = contest_dir / f'div{division}'
-                    change_file = division_dir / 'change.txt'
-                    if change_file.exists():
-                        self.read_change_file(contest_dir.name, division, change_file)
+    def load_history_from_contests(self, parallel=False):
+        contest_dirs = sorted(
+            (d for d in self.contests_path.glob('contest_*') if d.is_dir()),
+            key=lambda d: (contest_dir_number(d), d.name)
+        )
+
+        # Разбор может раскидываться по процессам, но применяется строго по номеру контеста,
+        # поэтому результат совпадает с последовательным чтением
+        for contest_id, divisions in self.read_contests_changes(contest_dirs, parallel):
+            for division, date, rows in divisions:
+                self.apply_change_rows(contest_id, division, date, rows)
 
         for training_dir in self.trainings_path.glob('training_*'):
             if training_dir.is_dir():
@@ -3960,78 +5536,65 @@ class RatingSystem:
                 if change_file.exists():
                     self.read_training_change_file(training_dir.name, change_file)
 
-    def read_change_file(self, contest_id, division, change_file):
-        """Читает историю из change.txt"""
-        try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+    def read_contests_changes(self, contest_dirs, parallel=False):
+        """Разбирает change.txt контестов; порядок сохраняется.
 
-            start_line = 0
-            for i, line in enumerate(lines):
-                if '=====' in line:
-                    start_line = i + 1
-                    break
+        Пул процессов (fork) берется только при parallel=True - из команды rebuild-ratings.
+        При старте app.py еще импортируется, и передача задач в пул ждет блокировку импорта,
+        а внутри запроса (ленивая загрузка при FAST_START) рядом работают другие потоки и
+        держатся блокировки, которые fork скопировал бы в дочерние процессы.
+        """
+        workers = min(self.HISTORY_REBUILD_WORKERS, len(contest_dirs))
 
-            for line in lines[start_line:]:
-                line = line.strip()
-                if not line:
-                    continue
+        if parallel and workers > 1 and len(contest_dirs) >= self.HISTORY_REBUILD_MIN_CONTESTS \
+                and 'fork' in multiprocessing.get_all_start_methods():
+            try:
+                with ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context('fork')) as executor:
+                    return list(executor.map(read_contest_changes, contest_dirs, chunksize=4))
+            except Exception as e:
+                print(f"Пул процессов недоступен, читаем последовательно: {e}")
 
-                match = re.match(
-                    r'(\d+)\.\s+([^:]+):\s+(\d+)\s+\([^)]+\)\s+→\s+(\d+)\s+\([^)]+\)\s+\(([+-]\d+)\)',
-                    line)
-                if match:
-                    position = int(match.group(1))
-                    nickname = match.group(2).strip()
-                    old_rating = int(match.group(3))
-                    new_rating = int(match.group(4))
-                    change = int(match.group(5))
-
-                    if nickname not in self.users:
-                        self.users[nickname] = {'rating': 0, 'tasks_score': 0}
+        return [read_contest_changes(contest_dir) for contest_dir in contest_dirs]
 
-                    unofficial = "[UNR]" in line or "UNRATED" in line or "unofficial" in line.lower()
+    def apply_change_rows(self, contest_id, division, date, rows):
+        """Добавляет в историю строки одного дивизиона из change.txt"""
+        date = date or datetime.now().strftime("%Y-%m-%d")
 
-                    tasks_solved_match = re.search(r'задач:\s+(\d+)', line)
-                    tasks_solved = int(tasks_solved_match.group(1)) if tasks_solved_match else 0
+        for row in rows:
+            nickname = row['nickname']
+            unofficial = row['unofficial']
+            tasks_solved = row['tasks_solved']
 
-                    if nickname not in self.user_history:
-                        self.user_history[nickname] = []
+            if nickname not in self.users:
+                self.users[nickname] = {'rating': 0, 'tasks_score': 0}
 
-                    already_processed = False
-                    for record in self.user_history[nickname]:
-                        if (record['contest'] == contest_id and
-                                record['division'] == division):
-                            already_processed = True
-                            break
-
-                    if not already_processed:
-                        allowed_division = division
-                        if "allowed_div" in line:
-                            match_div = re.search(r'allowed_div:(\d+)', line)
-                            if match_div:
-                                allowed_division = int(match_div.group(1))
-
-                        self.user_history[nickname].append({
-                            'contest': contest_id,
-                            'division': division,
-                            'position': position,
-                            'old_rating': old_rating,
-                            'new_rating': new_rating,
-                            'change': change,
-                            'tasks_solved': tasks_solved,
-                            'unofficial': unofficial,
-                            'allowed_division': allowed_division,
-                            'date': self.get_file_date(change_file),
-                            'type': 'contest'
-                        })
+            if nickname not in self.user_history:
+                self.user_history[nickname] = []
 
-                        if not unofficial:
-                            self.users[nickname]['rating'] = new_rating
-                            self.users[nickname]['tasks_score'] = self.users[nickname].get('tasks_score',
-                                                                                           0) + tasks_solved
-        except Exception as e:
-            print(f"Ошибка чтения change.txt {change_file}: {e}")
+            already_processed = self.has_contest_record(nickname, contest_id, division)
+
+            if not already_processed:
+                allowed_division = row['allowed_division'] or division
+
+                self.add_contest_record(nickname, {
+                    'contest': contest_id,
+                    'division': division,
+                    'position': row['position'],
+                    'old_rating': row['old_rating'],
+                    'new_rating': row['new_rating'],
+                    'change': row['change'],
+                    'tasks_solved': tasks_solved,
+                    'unofficial': unofficial,
+                    'allowed_division': allowed_division,
+                    'date': date,
+                    'type': 'contest'
+                })
+
+                if not unofficial:
+                    self.users[nickname]['rating'] = row['new_rating']
+                    self.users[nickname]['tasks_score'] = self.users[nickname].get('tasks_score',
+                                                                                   0) + tasks_solved
 
     def recalculate_ratings_from_history(self):
         """Пересчитывает текущие рейтинги из истории контестов"""
@@ -4039,57 +5602,51 @@ class RatingSystem:
         for nickname in self.users:
             self.users[nickname] = {'rating': 0, 'tasks_score': 0}
 
-        # Проходим по всей истории и восстанавливаем рейтинги
+        # Раскладываем официальные записи всех пользователей по номеру контеста.
+        # Внутри номера сохраняется порядок истории, как при устойчивой сортировке
+        events_by_contest = {}
         for nickname, history in self.user_history.items():
             if nickname not in self.users:
                 self.users[nickname] = {'rating': 0, 'tasks_score': 0}
 
-            # Сортируем историю по номеру контеста
-            def get_contest_number(record):
-                contest_id = record.get('contest', '')
-                match = re.search(r'contest_(\d+)', contest_id)
-                if match:
-                    return int(match.group(1))
-                return 0
-
-            sorted_history = sorted(history, key=get_contest_number)
-
-            # Обрабатываем каждый контест
-            for record in sorted_history:
+            for record in history:
                 if not record.get('unofficial', False):
-                    new_rating = record.get('new_rating', 0)
-                    tasks_solved = record.get('tasks_solved', 0)
-
-                    # Обновляем рейтинг
-                    self.users[nickname]['rating'] = new_rating
-
-                    # Добавляем баллы за задачи
-                    self.users[nickname]['tasks_score'] = self.users[nickname].get('tasks_score', 0) + tasks_solved
-
-    def get_file_date(self, change_file):
-        try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if 'Дата обработки:' in line:
-                        date_str = line.split('Дата обработки:')[1].strip()
-                        return date_str.split()[0]
-        except:
-            pass
-        return datetime.now().strftime("%Y-%m-%d")
-
-    def get_file_date(self, change_file):
-        try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if 'Дата обработки:' in line:
-                        date_str = line.split('Дата обработки:')[1].strip()
-                        return date_str.split()[0]
-        except:
-            pass
-        return datetime.now().strftime("%Y-%m-%d")
-
-    def generate_rating_chart(self, nickname, division=None):
-        """Генерирует график изменения рейтинга из ЗАМОРОЖЕННОЙ истории"""
+                    events_by_contest.setdefault(record['contest_number'], []).append((nickname, record))
+
+        # Один проход по общему потоку событий в порядке контестов
+        for contest_number in sorted(events_by_contest):
+            for nickname, record in events_by_contest[contest_number]:
+                user = self.users[nickname]
+                user['rating'] = record.get('new_rating', 0)
+                user['tasks_score'] = user.get('tasks_score', 0) + record.get('tasks_solved', 0)
+
+        self.leaderboard.rebuild(self.users)
+
+    def get_history_version(self, nickname):
+        """Хэш официальной истории пользователя; меняется вместе с тем, что рисует график"""
+        version = self.history_versions.get(nickname)
+        if version is None:
+            official = [
+                (h.get('contest'), h.get('contest_number'), h.get('new_rating'), h.get('change'),
+                 h.get('division'), h.get('position'), h.get('date'))
+                for h in self.user_history.get(nickname, []) if not h.get('unofficial', False)
+            ]
+            version = hashlib.sha1(json.dumps(official, ensure_ascii=False).encode('utf-8')).hexdigest()
+            self.history_versions[nickname] = version
+        return version
+
+    def get_rating_chart(self, nickname):
+        """График рейтинга из кэша; перерисовывается только после изменения истории"""
+        version = self.get_history_version(nickname)
+        chart = self.chart_cache.get(nickname, version)
+        if chart is None:
+            chart = self.generate_rating_chart(nickname)
+            if chart:
+                self.chart_cache.put(nickname, version, chart)
+        return chart
+
+    def get_rating_series(self, nickname):
+        """Точки графика рейтинга (официальные контесты по порядку) из ЗАМОРОЖЕННОЙ истории"""
         all_events = []
 
         contest_history = self.user_history.get(nickname, [])
@@ -4105,576 +5662,466 @@ class RatingSystem:
                 'change': contest['change'],
                 'division': contest.get('division'),
                 'position': contest.get('position'),
+                'number': contest['contest_number'],
                 'frozen': True
             })
 
-        def event_number_key(event):
-            match = re.search(r'contest_(\d+)', event.get('event', ''))
-            if match:
-                return int(match.group(1))
-            return 0
+        all_events.sort(key=lambda event: event['number'])
+        return all_events
 
-        all_events.sort(key=event_number_key)
+    def generate_rating_chart(self, nickname, division=None):
+        """Генерирует график изменения рейтинга из ЗАМОРОЖЕННОЙ истории"""
+        arguments = self.chart_arguments(nickname, division)
+        if arguments is None:
+            return None
+        return self.chart_renderer.render(*arguments)
+
+    def chart_arguments(self, nickname, division=None):
+        """(заголовок, подписи, рейтинги, подпись текущего, цвет) для графика или None, если точек меньше двух"""
+        all_events = self.get_rating_series(nickname)
 
         if len(all_events) < 2:
             return None
 
         dates = []
         ratings = []
-        events_info = []
 
         for event in all_events:
             if event['type'] == 'contest':
                 dates.append(event['event'].replace('contest_', ''))
                 ratings.append(event['rating'])  # ЗАМОРОЖЕННЫЙ рейтинг
-                events_info.append(event)
-
-        date_nums = list(range(1, len(dates) + 1))
-
-        fig, ax = plt.subplots(figsize=(12, 6), dpi=100)
-
-        ax.plot(date_nums, ratings, 'k-', linewidth=2, alpha=0.8)
-        ax.plot(date_nums, ratings, 'ko', markersize=4, markeredgecolor='k', markerfacecolor='k')
 
         title = f'Изменение рейтинга: {nickname}'
         if division:
             title += f' (Div {division})'
-        ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-
-        ax.set_xlabel('Номер контеста', fontsize=12)
-        ax.set_ylabel('Рейтинг', fontsize=12)
-
-        if len(date_nums) <= 30:
-            ax.set_xticks(date_nums)
-            ax.set_xticklabels(dates, rotation=45, ha='right')
-        else:
-            step = max(1, len(date_nums) // 20)
-            ax.set_xticks(date_nums[::step])
-            ax.set_xticklabels(dates[::step], rotation=45, ha='right')
-
-        ax.grid(True, alpha=0.3, linestyle='--')
-
-        if ratings:
-            y_min = max(0, min(ratings) - 100)
-            y_max = min(4000, max(ratings) + 100)
-            ax.set_ylim([y_min, y_max])
 
         current_rating = ratings[-1] if ratings else 0
         current_rank = self.get_rank_title(current_rating)
         rank_color = self.get_rank_color(current_rating)
 
-        ax.text(0.02, 0.98, f'Текущий: {current_rating} ({current_rank})',
-                transform=ax.transAxes, fontsize=12, fontweight='bold',
-                verticalalignment='top', color=rank_color,
-                bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.9, edgecolor='lightgray'))
-
-        plt.tight_layout()
-
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-        plt.close(fig)
-        buf.seek(0)
-
-        return base64.b64encode(buf.getvalue()).decode('utf-8')
-
+        return title, dates, ratings, f'Текущий: {current_rating} ({current_rank})', rank_color
 
-rating_system = RatingSystem('.')
 
+class LazyRatingSystem:
+    """Заместитель RatingSystem: загружает рейтинги при первом обращении"""
 
-def load_contests():
-    contests = []
-    contests_path = Path('contests')
+    def __init__(self, base_path):
+        object.__setattr__(self, '_base_path', base_path)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
 
-    if not contests_path.exists():
-        return contests
+    def load(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    object.__setattr__(self, '_instance', RatingSystem(self._base_path))
+                    record_startup_timing('rating_system', started)
+        return self._instance
 
-    contest_folders = list(contests_path.glob('contest_*'))
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
 
-    for folder in contest_folders:
-        if folder.is_dir():
-            contest_id = folder.name
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
 
-            number_match = re.search(r'contest_(\d+)', contest_id.lower())
-            number = number_match.group(1).lstrip('0') if number_match else contest_id
 
-            tags = []
-            tags_file = folder / 'tags.txt'
-            if tags_file.exists():
-                try:
-                    with open(tags_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        tags = [tag.strip() for tag in content.split(',') if tag.strip()]
-                except:
-                    pass
+rating_system = LazyRatingSystem('.')
 
-            divisions = []
-            total_participants = 0
-            processed = False
 
-            for div_num in [1, 2, 3, 4]:
-                division_dir = folder / f'div{div_num}'
-                if division_dir.exists():
-                    link_file = division_dir / 'link.txt'
-                    monitor_file = division_dir / 'monitor.csv'
-                    change_file = division_dir / 'change.txt'
+@app.before_request
+def sync_rating_system():
+    # Два stat на запрос: изменения от других воркеров подхватываются сразу, без перезапуска
+    if rating_system._instance is not None:
+        rating_system.refresh_from_disk()
 
-                    link = ""
-                    if link_file.exists():
-                        try:
-                            with open(link_file, 'r', encoding='utf-8') as f:
-                                link = f.read().strip()
-                        except:
-                            pass
 
-                    # УБИРАЕМ подсчет участников для отображения на иконках
-                    participants = 0  # Всегда 0, чтобы не отображалось на иконках
+def number_sort_key(item):
+    return int(item['number']) if item['number'].isdigit() else 0
 
-                    # Но сохраняем для статистики в другом месте
-                    actual_participants = 0
-                    if change_file.exists():
-                        try:
-                            with open(change_file, 'r', encoding='utf-8') as f:
-                                for line in f:
-                                    if 'Участников официально:' in line:
-                                        parts = line.split(':')
-                                        if len(parts) > 1:
-                                            try:
-                                                actual_participants = int(parts[1].strip())
-                                                total_participants += actual_participants
-                                            except:
-                                                pass
-                                        break
-                        except:
-                            pass
 
-                    if change_file.exists():
-                        processed = True
-
-                    if link or monitor_file.exists():
-                        divisions.append({
-                            'division': div_num,
-                            'link': link,
-                            'color': DivisionSystem.DIVISION_COLORS[div_num],
-                            'participants': participants,  # Всегда 0 для скрытия на иконках
-                            'actual_participants': actual_participants,  # Реальное число для внутреннего использования
-                            'processed': change_file.exists(),
-                            'has_monitor': monitor_file.exists()
-                        })
+def load_contest(folder):
+    """Собирает карточку контеста из его папки"""
+    contest_id = folder.name
 
-            analysis = None
-            analysis_files = list(folder.glob('*analysis*')) + list(folder.glob('*разбор*'))
-            if analysis_files:
-                analysis = analysis_files[0].name
+    number_match = re.search(r'contest_(\d+)', contest_id.lower())
+    number = number_match.group(1).lstrip('0') if number_match else contest_id
 
-            tasks_count = 0
-            for div in divisions:
-                if div['has_monitor']:
-                    monitor_file = folder / f'div{div["division"]}' / 'monitor.csv'
-                    try:
-                        with open(monitor_file, 'r', encoding='utf-8') as f:
-                            sample = f.read(1024)
-                            f.seek(0)
-
-                            if ';' in sample:
-                                reader = csv.DictReader(f, delimiter=';')
-                            else:
-                                reader = csv.DictReader(f)
-
-                            fieldnames = reader.fieldnames or []
-                            exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
-                                              'Score', 'Penalty', 'score', 'penalty', 'Баллы', 'баллы',
-                                              'user', 'User', 'USER', 'фио', 'ФИО']
-
-                            for field in fieldnames:
-                                if (field not in exclude_fields and
-                                        not field.startswith('Unnamed:') and
-                                        not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
-                                        field.strip() != ''):
-                                    tasks_count += 1
-                            if tasks_count > 0:
-                                break
-                    except:
-                        pass
+    tags = []
+    tags_file = folder / 'tags.txt'
+    if tags_file.exists():
+        try:
+            with open(tags_file, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+                tags = [tag.strip() for tag in content.split(',') if tag.strip()]
+        except:
+            pass
 
-            date = "Неизвестно"
-            for div in divisions:
-                if div['processed']:
-                    change_file = folder / f'div{div["division"]}' / 'change.txt'
-                    try:
-                        with open(change_file, 'r', encoding='utf-8') as f:
-                            for line in f:
-                                if 'Дата обработки:' in line:
-                                    date_part = line.split('Дата обработки:')[1].strip()
-                                    date = date_part.split()[0]
-                                    break
-                    except:
-                        pass
+    divisions = []
+    total_participants = 0
+    processed = False
 
-            if date == "Неизвестно":
-                match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
-                if match:
-                    year, month, day = match.groups()
-                    date = f"{year}-{month}-{day}"
+    for div_num in [1, 2, 3, 4]:
+        division_dir = folder / f'div{div_num}'
+        if division_dir.exists():
+            link_file = division_dir / 'link.txt'
+            monitor_file = division_dir / 'monitor.csv'
+            change_file = division_dir / 'change.txt'
 
-            date_obj = None
-            if date != "Неизвестно":
+            link = ""
+            if link_file.exists():
                 try:
-                    date_obj = datetime.strptime(date, "%Y-%m-%d")
+                    with open(link_file, 'r', encoding='utf-8') as f:
+                        link = f.read().strip()
                 except:
-                    try:
-                        date_obj = datetime.strptime(date, "%d.%m.%Y")
-                    except:
-                        date_obj = None
-
-            if not date_obj:
-                match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
-                if match:
-                    year, month, day = match.groups()
-                    try:
-                        date_obj = datetime(int(year), int(month), int(day))
-                        date = f"{year}-{month}-{day}"
-                    except:
-                        date_obj = datetime.min
-
-            winner = ""
-            max_rating = 0
-            for div in divisions:
-                if div['processed']:
-                    change_file = folder / f'div{div["division"]}' / 'change.txt'
-                    try:
-                        with open(change_file, 'r', encoding='utf-8') as f:
-                            for line in f:
-                                if line.strip().startswith('1.'):
-                                    winner_match = re.match(r'1\.\s+([^:]+):', line)
-                                    if winner_match:
-                                        winner = winner_match.group(1).strip()
-                                        rating_match = re.search(r'→\s+(\d+)\s+\(', line)
-                                        if rating_match:
-                                            rating = int(rating_match.group(1))
-                                            if rating > max_rating:
-                                                max_rating = rating
-                                        break
-                    except:
-                        pass
-
-            contests.append({
-                'id': contest_id,
-                'number': number,
-                'title': f"Контест {number}",
-                'date': date,
-                'date_obj': date_obj,
-                'divisions': divisions,
-                'analysis': analysis,
-                'total_participants': total_participants,  # Сохраняем для общей статистики
-                'winner': winner,
-                'max_rating': max_rating,
-                'tasks_count': tasks_count,
-                'tags': tags,
-                'processed': processed
-            })
-
-    contests.sort(key=lambda x: (
-        int(x['number']) if x['number'].isdigit() else 0
-    ), reverse=True)
-
-    return contests
+                    pass
 
+            # УБИРАЕМ подсчет участников для отображения на иконках
+            participants = 0  # Всегда 0, чтобы не отображалось на иконках
 
-def load_trainings():
-    trainings = []
-    trainings_path = Path('trainings')
+            # Но сохраняем для статистики в другом месте
+            actual_participants = 0
+            if change_file.exists():
+                try:
+                    parsed = get_parsed_change(change_file)
+                    if parsed.official_participants is not None:
+                        actual_participants = parsed.official_participants
+                        total_participants += actual_participants
+                except:
+                    pass
 
-    if not trainings_path.exists():
-        return trainings
+            if change_file.exists():
+                processed = True
+
+            if link or monitor_file.exists():
+                divisions.append({
+                    'division': div_num,
+                    'link': link,
+                    'color': DivisionSystem.DIVISION_COLORS[div_num],
+                    'participants': participants,  # Всегда 0 для скрытия на иконках
+                    'actual_participants': actual_participants,  # Реальное число для внутреннего использования
+                    'processed': change_file.exists(),
+                    'has_monitor': monitor_file.exists()
+                })
 
-    training_folders = list(trainings_path.glob('training_*'))
+    analysis = None
+    analysis_files = list(folder.glob('*analysis*')) + list(folder.glob('*разбор*'))
+    if analysis_files:
+        analysis = analysis_files[0].name
 
-    for folder in training_folders:
-        if folder.is_dir():
-            training_id = folder.name
+    tasks_count = 0
+    for div in divisions:
+        if div['has_monitor']:
+            monitor_file = folder / f'div{div["division"]}' / 'monitor.csv'
+            try:
+                fieldnames = get_parsed_monitor(monitor_file).fieldnames
+                for field in fieldnames:
+                    if (field not in ParsedMonitor.SCORE_EXCLUDE_FIELDS and
+                            not field.startswith('Unnamed:') and
+                            not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
+                            field.strip() != ''):
+                        tasks_count += 1
+                if tasks_count > 0:
+                    break
+            except:
+                pass
 
-            number_match = re.search(r'training_(\d+)', training_id.lower())
-            number = number_match.group(1).lstrip('0') if number_match else training_id
+    date = "Неизвестно"
+    for div in divisions:
+        if div['processed']:
+            change_file = folder / f'div{div["division"]}' / 'change.txt'
+            try:
+                parsed = get_parsed_change(change_file)
+                if parsed.date:
+                    date = parsed.date
+            except:
+                pass
 
-            tags = []
-            tags_file = folder / 'tags.txt'
-            if tags_file.exists():
-                try:
-                    with open(tags_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        tags = [tag.strip() for tag in content.split(',') if tag.strip()]
-                except:
-                    pass
+    if date == "Неизвестно":
+        match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
+        if match:
+            year, month, day = match.groups()
+            date = f"{year}-{month}-{day}"
 
-            monitor_file = folder / 'monitor.csv'
-            change_file = folder / 'change.txt'
-            analysis_files = list(folder.glob('*analysis*')) + list(folder.glob('*разбор*'))
-            video_file = folder / 'video.txt'
-            link_file = folder / 'link.txt'
+    date_obj = None
+    if date != "Неизвестно":
+        try:
+            date_obj = datetime.strptime(date, "%Y-%m-%d")
+        except:
+            try:
+                date_obj = datetime.strptime(date, "%d.%m.%Y")
+            except:
+                date_obj = None
 
-            monitor = monitor_file.name if monitor_file.exists() else None
-            analysis = analysis_files[0].name if analysis_files else None
+    if not date_obj:
+        match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
+        if match:
+            year, month, day = match.groups()
+            try:
+                date_obj = datetime(int(year), int(month), int(day))
+                date = f"{year}-{month}-{day}"
+            except:
+                date_obj = datetime.min
 
-            video = None
-            if video_file.exists():
-                try:
-                    with open(video_file, 'r', encoding='utf-8') as f:
-                        video = f.read().strip()
-                except:
-                    pass
+    winner = ""
+    max_rating = 0
+    for div in divisions:
+        if div['processed']:
+            change_file = folder / f'div{div["division"]}' / 'change.txt'
+            try:
+                parsed = get_parsed_change(change_file)
+                if parsed.winner:
+                    winner = parsed.winner
+                    if parsed.winner_rating > max_rating:
+                        max_rating = parsed.winner_rating
+            except:
+                pass
 
-            link = None
-            if link_file.exists():
-                try:
-                    with open(link_file, 'r', encoding='utf-8') as f:
-                        link = f.read().strip()
-                except:
-                    pass
+    return {
+        'id': contest_id,
+        'number': number,
+        'title': f"Контест {number}",
+        'date': date,
+        'date_obj': date_obj,
+        'divisions': divisions,
+        'analysis': analysis,
+        'total_participants': total_participants,  # Сохраняем для общей статистики
+        'winner': winner,
+        'max_rating': max_rating,
+        'tasks_count': tasks_count,
+        'tags': tags,
+        'processed': processed
+    }
 
-            processed = change_file.exists()
 
-            tasks_count = 0
-            if monitor_file.exists():
-                try:
-                    with open(monitor_file, 'r', encoding='utf-8') as f:
-                        sample = f.read(1024)
-                        f.seek(0)
-
-                        if ';' in sample:
-                            reader = csv.DictReader(f, delimiter=';')
-                        else:
-                            reader = csv.DictReader(f)
-
-                        fieldnames = reader.fieldnames or []
-                        exclude_fields = ['place', 'user_name', 'login', 'user', 'User', 'USER',
-                                          'Score', 'Penalty', 'score', 'penalty', 'фио', 'ФИО']
-
-                        for field in fieldnames:
-                            if (field not in exclude_fields and
-                                    not field.startswith('Unnamed:') and
-                                    not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
-                                    field.strip() != ''):
-                                tasks_count += 1
-                except:
-                    pass
+def load_training(folder):
+    """Собирает карточку тренировки из ее папки"""
+    training_id = folder.name
 
-            participants = 0
-            max_points = 0
-            avg_points = 0
+    number_match = re.search(r'training_(\d+)', training_id.lower())
+    number = number_match.group(1).lstrip('0') if number_match else training_id
 
-            if change_file.exists():
-                try:
-                    with open(change_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        for line in lines:
-                            if 'Участников:' in line:
-                                parts = line.split(':')
-                                if len(parts) > 1:
-                                    try:
-                                        participants = int(parts[1].strip())
-                                    except:
-                                        pass
-                            elif '1.' in line:
-                                match = re.search(r'решено\s+(\d+)\s+задач', line)
-                                if match:
-                                    max_points = int(match.group(1))
-                except:
-                    pass
+    tags = []
+    tags_file = folder / 'tags.txt'
+    if tags_file.exists():
+        try:
+            with open(tags_file, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+                tags = [tag.strip() for tag in content.split(',') if tag.strip()]
+        except:
+            pass
 
-            date = "Неизвестно"
-            if change_file.exists():
-                try:
-                    with open(change_file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if 'Дата обработки:' in line:
-                                date_part = line.split('Дата обработки:')[1].strip()
-                                date = date_part.split()[0]
-                                break
-                except:
-                    pass
+    monitor_file = folder / 'monitor.csv'
+    change_file = folder / 'change.txt'
+    analysis_files = list(folder.glob('*analysis*')) + list(folder.glob('*разбор*'))
+    video_file = folder / 'video.txt'
+    link_file = folder / 'link.txt'
 
-            if date == "Неизвестно":
-                match = re.search(r'(\d{4})(\d{2})(\d{2})', training_id)
-                if match:
-                    year, month, day = match.groups()
-                    date = f"{year}-{month}-{day}"
+    monitor = monitor_file.name if monitor_file.exists() else None
+    analysis = analysis_files[0].name if analysis_files else None
 
-            date_obj = None
-            if date != "Неизвестно":
-                try:
-                    date_obj = datetime.strptime(date, "%Y-%m-%d")
-                except:
-                    try:
-                        date_obj = datetime.strptime(date, "%d.%m.%Y")
-                    except:
-                        date_obj = None
+    video = None
+    if video_file.exists():
+        try:
+            with open(video_file, 'r', encoding='utf-8') as f:
+                video = f.read().strip()
+        except:
+            pass
 
-            if not date_obj:
-                match = re.search(r'(\d{4})(\d{2})(\d{2})', training_id)
-                if match:
-                    year, month, day = match.groups()
-                    try:
-                        date_obj = datetime(int(year), int(month), int(day))
-                        date = f"{year}-{month}-{day}"
-                    except:
-                        date_obj = datetime.min
+    link = None
+    if link_file.exists():
+        try:
+            with open(link_file, 'r', encoding='utf-8') as f:
+                link = f.read().strip()
+        except:
+            pass
 
-            trainings.append({
-                'id': training_id,
-                'number': number,
-                'title': f"Тренировка {number}",
-                'date': date,
-                'date_obj': date_obj,
-                'tasks_count': tasks_count,
-                'participants': participants,
-                'max_points': max_points,
-                'avg_points': avg_points,
-                'monitor': monitor,
-                'analysis': analysis,
-                'video': video,
-                'link': link,
-                'tags': tags,
-                'processed': processed
-            })
+    processed = change_file.exists()
 
-    trainings.sort(key=lambda x: (
-        int(x['number']) if x['number'].isdigit() else 0
-    ), reverse=True)
+    tasks_count = 0
+    if monitor_file.exists():
+        try:
+            fieldnames = get_parsed_monitor(monitor_file).fieldnames
+            exclude_fields = ['place', 'user_name', 'login', 'user', 'User', 'USER',
+                              'Score', 'Penalty', 'score', 'penalty', 'фио', 'ФИО']
+
+            for field in fieldnames:
+                if (field not in exclude_fields and
+                        not field.startswith('Unnamed:') and
+                        not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
+                        field.strip() != ''):
+                    tasks_count += 1
+        except:
+            pass
 
-    return trainings
+    participants = 0
+    max_points = 0
+    avg_points = 0
 
+    date = "Неизвестно"
+    if change_file.exists():
+        try:
+            parsed = get_parsed_change(change_file)
+            if parsed.participants is not None:
+                participants = parsed.participants
+            if parsed.training_rows:
+                max_points = parsed.training_rows[0]['solved']
+            if parsed.date:
+                date = parsed.date
+        except:
+            pass
 
-def load_team_contests():
-    contests = []
-    team_contests_path = Path('team_contests')
+    if date == "Неизвестно":
+        match = re.search(r'(\d{4})(\d{2})(\d{2})', training_id)
+        if match:
+            year, month, day = match.groups()
+            date = f"{year}-{month}-{day}"
 
-    if not team_contests_path.exists():
-        return contests
+    date_obj = None
+    if date != "Неизвестно":
+        try:
+            date_obj = datetime.strptime(date, "%Y-%m-%d")
+        except:
+            try:
+                date_obj = datetime.strptime(date, "%d.%m.%Y")
+            except:
+                date_obj = None
 
-    contest_folders = list(team_contests_path.glob('contest_*'))
+    if not date_obj:
+        match = re.search(r'(\d{4})(\d{2})(\d{2})', training_id)
+        if match:
+            year, month, day = match.groups()
+            try:
+                date_obj = datetime(int(year), int(month), int(day))
+                date = f"{year}-{month}-{day}"
+            except:
+                date_obj = datetime.min
+
+    return {
+        'id': training_id,
+        'number': number,
+        'title': f"Тренировка {number}",
+        'date': date,
+        'date_obj': date_obj,
+        'tasks_count': tasks_count,
+        'participants': participants,
+        'max_points': max_points,
+        'avg_points': avg_points,
+        'monitor': monitor,
+        'analysis': analysis,
+        'video': video,
+        'link': link,
+        'tags': tags,
+        'processed': processed
+    }
 
-    for folder in contest_folders:
-        if folder.is_dir():
-            contest_id = folder.name
 
-            number_match = re.search(r'contest_(\d+)', contest_id.lower())
-            number = number_match.group(1).lstrip('0') if number_match else contest_id
+def load_team_contest(folder):
+    """Собирает карточку командного контеста из его папки"""
+    contest_id = folder.name
 
-            tags = []
-            tags_file = folder / 'tags.txt'
-            if tags_file.exists():
-                try:
-                    with open(tags_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        tags = [tag.strip() for tag in content.split(',') if tag.strip()]
-                except:
-                    pass
+    number_match = re.search(r'contest_(\d+)', contest_id.lower())
+    number = number_match.group(1).lstrip('0') if number_match else contest_id
 
-            monitor_file = folder / 'monitor.csv'
-            change_file = folder / 'change.txt'
-            analysis_files = list(folder.glob('*analysis*')) + list(folder.glob('*разбор*'))
-            link_file = folder / 'link.txt'
+    tags = []
+    tags_file = folder / 'tags.txt'
+    if tags_file.exists():
+        try:
+            with open(tags_file, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+                tags = [tag.strip() for tag in content.split(',') if tag.strip()]
+        except:
+            pass
 
-            analysis = analysis_files[0].name if analysis_files else None
-            processed_file = folder / 'processed.txt'
-            processed = processed_file.exists()
+    monitor_file = folder / 'monitor.csv'
+    change_file = folder / 'change.txt'
+    analysis_files = list(folder.glob('*analysis*')) + list(folder.glob('*разбор*'))
+    link_file = folder / 'link.txt'
 
-            link = None
-            if link_file.exists():
-                try:
-                    with open(link_file, 'r', encoding='utf-8') as f:
-                        link = f.read().strip()
-                except:
-                    pass
+    analysis = analysis_files[0].name if analysis_files else None
+    processed_file = folder / 'processed.txt'
+    processed = processed_file.exists()
 
-            tasks_count = 0
-            teams = 0
+    link = None
+    if link_file.exists():
+        try:
+            with open(link_file, 'r', encoding='utf-8') as f:
+                link = f.read().strip()
+        except:
+            pass
 
-            if monitor_file.exists():
-                try:
-                    with open(monitor_file, 'r', encoding='utf-8') as f:
-                        sample = f.read(1024)
-                        f.seek(0)
-
-                        if ';' in sample:
-                            reader = csv.DictReader(f, delimiter=';')
-                        else:
-                            reader = csv.DictReader(f)
-
-                        fieldnames = reader.fieldnames or []
-                        exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
-                                          'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
-                                          'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name']
-
-                        for field in fieldnames:
-                            if (field not in exclude_fields and
-                                    not field.startswith('Unnamed:') and
-                                    not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
-                                    field.strip() != ''):
-                                tasks_count += 1
-
-                        f.seek(0)
-                        teams = sum(1 for _ in reader)
-                except:
-                    pass
+    tasks_count = 0
+    teams = 0
 
-            date = "Неизвестно"
-            if processed_file.exists():
-                try:
-                    with open(processed_file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if 'обработан:' in line:
-                                date_part = line.split('обработан:')[1].strip()
-                                date = date_part.split()[0]
-                                break
-                except:
-                    pass
+    if monitor_file.exists():
+        try:
+            monitor = get_parsed_monitor(monitor_file)
+            exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
+                              'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
+                              'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name']
 
-            if date == "Неизвестно":
-                match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
-                if match:
-                    year, month, day = match.groups()
-                    date = f"{year}-{month}-{day}"
+            for field in monitor.fieldnames:
+                if (field not in exclude_fields and
+                        not field.startswith('Unnamed:') and
+                        not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
+                        field.strip() != ''):
+                    tasks_count += 1
 
-            date_obj = None
-            if date != "Неизвестно":
-                try:
-                    date_obj = datetime.strptime(date, "%Y-%m-%d")
-                except:
-                    try:
-                        date_obj = datetime.strptime(date, "%d.%m.%Y")
-                    except:
-                        date_obj = None
+            teams = len(monitor.rows)
+        except:
+            pass
 
-            if not date_obj:
-                match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
-                if match:
-                    year, month, day = match.groups()
-                    try:
-                        date_obj = datetime(int(year), int(month), int(day))
-                        date = f"{year}-{month}-{day}"
-                    except:
-                        date_obj = datetime.min
+    date = "Неизвестно"
+    if processed_file.exists():
+        try:
+            with open(processed_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if 'обработан:' in line:
+                        date_part = line.split('обработан:')[1].strip()
+                        date = date_part.split()[0]
+                        break
+        except:
+            pass
 
-            contests.append({
-                'id': contest_id,
-                'number': number,
-                'title': f"Командный контест {number}",
-                'date': date,
-                'date_obj': date_obj,
-                'tasks_count': tasks_count,
-                'teams': teams,
-                'analysis': analysis,
-                'link': link,
-                'tags': tags,
-                'processed': processed
-            })
+    if date == "Неизвестно":
+        match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
+        if match:
+            year, month, day = match.groups()
+            date = f"{year}-{month}-{day}"
 
-    contests.sort(key=lambda x: (
-        int(x['number']) if x['number'].isdigit() else 0
-    ), reverse=True)
+    date_obj = None
+    if date != "Неизвестно":
+        try:
+            date_obj = datetime.strptime(date, "%Y-%m-%d")
+        except:
+            try:
+                date_obj = datetime.strptime(date, "%d.%m.%Y")
+            except:
+                date_obj = None
 
-    return contests
+    if not date_obj:
+        match = re.search(r'(\d{4})(\d{2})(\d{2})', contest_id)
+        if match:
+            year, month, day = match.groups()
+            try:
+                date_obj = datetime(int(year), int(month), int(day))
+                date = f"{year}-{month}-{day}"
+            except:
+                date_obj = datetime.min
+
+    return {
+        'id': contest_id,
+        'number': number,
+        'title': f"Командный контест {number}",
+        'date': date,
+        'date_obj': date_obj,
+        'tasks_count': tasks_count,
+        'teams': teams,
+        'analysis': analysis,
+        'link': link,
+        'tags': tags,
+        'processed': processed
+    }
 
 
 def load_math_problems():
@@ -4845,21 +6292,25 @@ def load_news():
     return news
 
 
-def get_participants():
+def get_participants(start=0, stop=None):
+    """Статистика участников в порядке таблицы лидеров (места start+1..stop)"""
+    leaderboard = rating_system.leaderboard
+    if stop is None:
+        stop = len(leaderboard)
+
     participants = []
 
-    for nickname in rating_system.users.keys():
+    for nickname in leaderboard.range(start, stop):
         stats = rating_system.get_user_stats(nickname)
         if stats:
             participants.append(stats)
 
-    participants.sort(key=lambda x: x['rating'], reverse=True)
-
     return participants
 
 
-def load_upcoming_contests():
-    contests = load_contests()
+def load_upcoming_contests(contests=None):
+    if contests is None:
+        contests = catalog.get('contests')
     upcoming = []
 
     for contest in contests:
@@ -4871,34 +6322,376 @@ def load_upcoming_contests():
     return upcoming
 
 
+# ========== КАТАЛОГ КОНТЕНТА ==========
+
+class ContentCatalog:
+    """Списки контента в памяти; перечитываются только измененные папки"""
+
+    CHECK_INTERVAL = 2.0  # Не чаще одной проверки файловой системы за интервал (сек)
+    PAGE_SIZE = 20  # Карточек на странице вкладки
+    MAX_PAGE_SIZE = 100
+
+    def __init__(self):
+        # Папки с отдельной карточкой на каждую подпапку: (корень, префикс, загрузчик)
+        self.folder_sections = {
+            'contests': ('contests', 'contest_', load_contest),
+            'trainings': ('trainings', 'training_', load_training),
+            'team_contests': ('team_contests', 'contest_', load_team_contest),
+        }
+        # Плоские папки, которые перечитываются целиком: (корень, загрузчик)
+        self.flat_sections = {
+            'math_problems': ('math', load_math_problems),
+            'news': ('news', load_news),
+        }
+
+        self.sections = {}  # {name: {'items': [...], 'version': int, 'signature': ..., 'entries': {...}}}
+        self.last_check = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scan_signature(path, depth=1):
+        """Снимок (имя, mtime, размер) содержимого папки через os.scandir"""
+        signature = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    st = entry.stat()
+                    nested = None
+                    if depth > 0 and entry.is_dir():
+                        nested = ContentCatalog.scan_signature(entry.path, depth - 1)
+                    signature.append((entry.name, st.st_mtime_ns, st.st_size, nested))
+        except OSError:
+            return None
+        signature.sort(key=lambda x: x[0])
+        return tuple(signature)
+
+    def _section(self, name):
+        if name not in self.sections:
+            self.sections[name] = {'items': [], 'version': 0, 'signature': None, 'entries': {}}
+        return self.sections[name]
+
+    def _refresh_folders(self, name, root, prefix, loader):
+        section = self._section(name)
+        entries = {}
+        changed = False
+
+        try:
+            with os.scandir(root) as it:
+                folder_names = [e.name for e in it if e.name.startswith(prefix) and e.is_dir()]
+        except OSError:
+            folder_names = []
+
+        for folder_name in folder_names:
+            signature = self.scan_signature(os.path.join(root, folder_name))
+            cached = section['entries'].get(folder_name)
+            if cached is not None and cached[0] == signature:
+                entries[folder_name] = cached
+            else:
+                entries[folder_name] = (signature, loader(Path(root) / folder_name))
+                changed = True
+
+        if changed or entries.keys() != section['entries'].keys() or not section['version']:
+            items = [item for _, item in entries.values()]
+            items.sort(key=number_sort_key, reverse=True)
+            section['items'] = items
+            section['version'] += 1
+        section['entries'] = entries
+
+    def _refresh_flat(self, name, root, loader):
+        section = self._section(name)
+        signature = self.scan_signature(root, depth=0)
+        if signature != section['signature'] or not section['version']:
+            section['items'] = loader()
+            section['signature'] = signature
+            section['version'] += 1
+
+    def _refresh_participants(self):
+        section = self._section('participants')
+        if section['signature'] != rating_system.version or not section['version']:
+            section['items'] = get_participants()
+            section['signature'] = rating_system.version
+            section['version'] += 1
+
+    def refresh(self, force=False):
+        """Проверяет изменения на диске и обновляет только затронутые записи"""
+        with self._lock:
+            now = time.monotonic()
+            if force or now - self.last_check >= self.CHECK_INTERVAL:
+                for name, (root, prefix, loader) in self.folder_sections.items():
+                    self._refresh_folders(name, root, prefix, loader)
+                for name, (root, loader) in self.flat_sections.items():
+                    self._refresh_flat(name, root, loader)
+                self.last_check = now
+
+    def _refresh_section(self, name):
+        if name == 'participants':
+            # Полный список нужен только странице участников; строится по требованию
+            with self._lock:
+                self._refresh_participants()
+        else:
+            self.refresh()
+
+    def get(self, name):
+        self._refresh_section(name)
+        return self.sections[name]['items']
+
+    def version(self, name):
+        self._refresh_section(name)
+        return self.sections[name]['version']
+
+    def _search_keys(self, name):
+        """id, название и теги карточек в нижнем регистре; пересчитываются при замене списка"""
+        section = self.sections[name]
+        items = section['items']
+        cached = section.get('search')
+        if cached is None or cached[0] is not items:
+            keys = [
+                (str(item.get('id', '')).lower(), str(item.get('title', '')).lower(),
+                 [str(tag).lower() for tag in item.get('tags', [])])
+                for item in items
+            ]
+            tags = sorted({tag for _, _, item_tags in keys for tag in item_tags})
+            cached = (items, keys, tags)
+            section['search'] = cached
+        return cached
+
+    def tags(self, name):
+        """Все теги раздела (в нижнем регистре, по алфавиту)"""
+        self._refresh_section(name)
+        return self._search_keys(name)[2]
+
+    def page(self, name, offset=0, limit=PAGE_SIZE, tags=None, query=None):
+        """Страница раздела в порядке каталога; теги - любой из выбранных, поиск - как на клиенте"""
+        self._refresh_section(name)
+        items, keys, _ = self._search_keys(name)
+
+        if tags or query:
+            tags = set(tags or ())
+            items = [
+                item for item, (item_id, title, item_tags) in zip(items, keys)
+                if (not tags or any(tag in tags for tag in item_tags))
+                and (not query or query in item_id or query in title or any(query in tag for tag in item_tags))
+            ]
+
+        return len(items), items[offset:offset + limit]
+
+    def invalidate(self):
+        """Заставляет следующий запрос перепроверить файловую систему"""
+        with self._lock:
+            self.last_check = 0
+
+
+catalog = ContentCatalog()
+
+
+# ========== ШАБЛОН ГЛАВНОЙ СТРАНИЦЫ ==========
+
+class DashboardTemplate:
+    """Шаблон главной страницы: компилируется один раз, секции кэшируются по версии их данных"""
+
+    def __init__(self, source):
+        self.source = source
+        self._template = None
+        self._fragments = {}  # {секция: (версия данных, готовый HTML)}
+        self._lock = threading.Lock()
+
+    @property
+    def template(self):
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    self._template = app.jinja_env.from_string(self.source)
+        return self._template
+
+    def fragment(self, section, version, get_context):
+        """HTML блока {section}_section; перерисовывается только при смене версии"""
+        cached = self._fragments.get(section)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        html = Markup(self.render_block(section, get_context()))
+
+        with self._lock:
+            self._fragments[section] = (version, html)
+        return html
+
+    def render_block(self, section, context):
+        """HTML одного блока шаблона без кэширования"""
+        template = self.template
+        return ''.join(template.blocks[f'{section}_section'](template.new_context(context)))
+
+    def render(self, **context):
+        app.update_template_context(context)
+        return self.template.render(context)
+
+
+# ========== СТАТИЧЕСКИЕ РЕСУРСЫ ==========
+
+class StaticAssets:
+    """Встроенные в HTML стили и скрипты, вынесенные в файлы с хэшем содержимого в имени"""
+
+    INLINE_BLOCK_RE = re.compile(r'<(style|script)([^>]*)>(.*?)</\1>', re.S)
+    MIMETYPES = {'css': 'text/css', 'js': 'application/javascript'}
+
+    def __init__(self, url_prefix='/assets/'):
+        self.url_prefix = url_prefix
+        self.files = {}  # {имя файла: (расширение, тело, тело в gzip)}
+
+    def extract(self, html, name):
+        """Заменяет встроенные <style>/<script> ссылками на файлы; вызывается один раз при запуске"""
+        def replace(match):
+            tag, attrs, body = match.groups()
+            if attrs.strip():
+                # Внешние скрипты и блоки с атрибутами остаются как есть
+                return match.group(0)
+
+            extension = 'css' if tag == 'style' else 'js'
+            data = body.encode('utf-8')
+            filename = f'{name}.{hashlib.sha1(data).hexdigest()[:16]}.{extension}'
+            self.files[filename] = (extension, data, gzip.compress(data, compresslevel=9, mtime=0))
+
+            if tag == 'style':
+                return f'<link rel="stylesheet" href="{self.url_prefix}{filename}">'
+            return f'<script src="{self.url_prefix}{filename}"></script>'
+
+        return self.INLINE_BLOCK_RE.sub(replace, html)
+
+    def respond(self, filename):
+        entry = self.files.get(filename)
+        if entry is None:
+            return None
+        extension, data, compressed = entry
+
+        use_gzip = request.accept_encodings['gzip'] > 0
+        response = Response(compressed if use_gzip else data, mimetype=self.MIMETYPES[extension])
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        # Имя меняется вместе с содержимым, поэтому файл можно кэшировать навсегда
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+static_assets = StaticAssets()
+
+
+@app.route('/assets/<filename>')
+def serve_static_asset(filename):
+    response = static_assets.respond(filename)
+    if response is None:
+        return "Файл не найден", 404
+    return response
+
+
+dashboard = DashboardTemplate(static_assets.extract(HTML, 'dashboard'))
+
+
+# ========== КЭШ СТРАНИЦ ==========
+
+class PageCache:
+    """Готовые страницы по версии данных: ETag, ответ 304 и заранее сжатые варианты"""
+
+    GZIP_LEVEL = 6
+
+    def __init__(self):
+        self._entries = {}  # {страница: {'version', 'etag', 'bodies'}}
+        self._lock = threading.Lock()
+
+    def _build(self, version, render):
+        body = render().encode('utf-8')
+        bodies = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=self.GZIP_LEVEL, mtime=0),
+        }
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body)
+        # Хэш содержимого, а не счетчик версий: счетчики начинаются заново после перезапуска
+        etag = hashlib.sha1(body).hexdigest()[:32]
+        return {'version': version, 'etag': etag, 'bodies': bodies}
+
+    @staticmethod
+    def variant_etag(etag, encoding):
+        return etag if encoding == 'identity' else f'{etag}-{encoding}'
+
+    def respond(self, name, version, render):
+        """Ответ для страницы name; render вызывается только при смене version"""
+        entry = self._entries.get(name)
+        if entry is None or entry['version'] != version:
+            entry = self._build(version, render)
+            with self._lock:
+                self._entries[name] = entry
+
+        offered = [encoding for encoding in ('br', 'gzip') if encoding in entry['bodies']]
+        encoding = request.accept_encodings.best_match(offered) or 'identity'
+        etag = self.variant_etag(entry['etag'], encoding)
+
+        if any(request.if_none_match.contains_weak(self.variant_etag(entry['etag'], variant))
+               for variant in entry['bodies']):
+            response = Response(status=304)
+        else:
+            response = Response(entry['bodies'][encoding], mimetype='text/html')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+page_cache = PageCache()
+
+
 @app.route('/')
 def index():
-    contests = load_contests()
-    trainings = load_trainings()
-    team_contests = load_team_contests()
-    math_problems = load_math_problems()
-    news = load_news()
-    participants = get_participants()
-
-    # Получаем ближайшие контесты
-    upcoming_contests = load_upcoming_contests()
+    version = tuple(catalog.version(name) for name in
+                    ('contests', 'trainings', 'team_contests', 'math_problems', 'news'))
+    return page_cache.respond('index', version + (rating_system.version,), render_index)
+
+
+def render_index():
+    contests = catalog.get('contests')
+    trainings = catalog.get('trainings')
+    team_contests = catalog.get('team_contests')
+    math_problems = catalog.get('math_problems')
+    news = catalog.get('news')
+
+    contests_version = catalog.version('contests')
+    page_size = ContentCatalog.PAGE_SIZE
+
+    # Секции перерисовываются только при изменении их данных; статистика участников
+    # строится только для показанных и только когда изменились рейтинги.
+    # Из контестов, тренировок и командных сразу рисуется только первая страница контестов,
+    # остальное вкладки догружают через /api/contests, /api/trainings, /api/team_contests
+    fragments = {
+        'contests': dashboard.fragment('contests', contests_version,
+                                       lambda: {'contests': contests[:page_size]}),
+        'trainings': Markup(''),
+        'team_contests': Markup(''),
+        'math_problems': dashboard.fragment('math_problems', catalog.version('math_problems'),
+                                            lambda: {'math_problems': math_problems}),
+        'news': dashboard.fragment('news', catalog.version('news'),
+                                   lambda: {'news': news}),
+        'participants': dashboard.fragment('participants', rating_system.version,
+                                           lambda: {'participants': get_participants(0, 25)}),
+        # Получаем ближайшие контесты
+        'upcoming_contests': dashboard.fragment('upcoming_contests', contests_version,
+                                                lambda: {'upcoming_contests': load_upcoming_contests(contests)}),
+    }
 
     total_contests = len(contests)
     total_trainings = len(trainings)
     total_team_contests = len(team_contests)
     total_math = len(math_problems)
     total_news = len(news)
-    total_participants = len(participants)
-
-    return render_template_string(
-        HTML,
-        contests=contests,
-        trainings=trainings,
-        team_contests=team_contests,
-        math_problems=math_problems,
-        news=news,
-        participants=participants[:25],
-        upcoming_contests=upcoming_contests,
+    total_participants = len(rating_system.leaderboard)
+
+    return dashboard.render(
+        fragments=fragments,
+        page_size=page_size,
+        contest_tags=','.join(catalog.tags('contests')),
+        training_tags=','.join(catalog.tags('trainings')),
+        team_tags=','.join(catalog.tags('team_contests')),
         total_contests=total_contests,
         total_trainings=total_trainings,
         total_team_contests=total_team_contests,
@@ -4908,6 +6701,54 @@ def index():
     )
 
 
+def catalog_page_response(name):
+    """Страница раздела каталога для ленивой подгрузки вкладок"""
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = int(request.args.get('limit', ContentCatalog.PAGE_SIZE))
+        limit = min(ContentCatalog.MAX_PAGE_SIZE, max(1, limit))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Некорректные offset или limit'
+        })
+
+    tags = [tag.strip().lower() for tag in request.args.get('tags', '').split(',') if tag.strip()]
+    query = request.args.get('q', '').strip().lower()
+
+    total, items = catalog.page(name, offset, limit, tags, query)
+
+    # Сообщение "пока нет" из шаблона нужно только для первой страницы без фильтров
+    if items or (offset == 0 and not tags and not query):
+        html = dashboard.render_block(name, {name: items})
+    else:
+        html = ''
+
+    return jsonify({
+        'success': True,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'items': items,
+        'html': html
+    })
+
+
+@app.route('/api/contests')
+def api_contests():
+    return catalog_page_response('contests')
+
+
+@app.route('/api/trainings')
+def api_trainings():
+    return catalog_page_response('trainings')
+
+
+@app.route('/api/team_contests')
+def api_team_contests():
+    return catalog_page_response('team_contests')
+
+
 @app.route('/contest/<contest_id>/<filename>')
 def serve_contest_file(contest_id, filename):
     contest_path = Path('contests') / contest_id
@@ -4963,7 +6804,7 @@ def serve_news_file(news_id, filename):
 
 @app.route('/api/user/<nickname>/chart')
 def get_user_chart(nickname):
-    chart_data = rating_system.generate_rating_chart(nickname)
+    chart_data = rating_system.get_rating_chart(nickname)
 
     if chart_data:
         return f'<img src="data:image/png;base64,{chart_data}" alt="Rating Chart" style="max-width:100%;">'
@@ -4971,6 +6812,27 @@ def get_user_chart(nickname):
         return '<p>Недостаточно данных для построения графика. Нужно минимум 2 контеста.</p>'
 
 
+@app.route('/api/user/<nickname>/rating-series')
+def get_user_rating_series(nickname):
+    if nickname not in rating_system.users:
+        return jsonify({
+            'success': False,
+            'error': 'Пользователь не найден'
+        })
+
+    series = rating_system.get_rating_series(nickname)
+    current_rating = series[-1]['rating'] if series else 0
+
+    return jsonify({
+        'success': True,
+        'nickname': nickname,
+        'current_rating': current_rating,
+        'rank': rating_system.get_rank_title(current_rating),
+        'rank_color': rating_system.get_rank_color(current_rating),
+        'series': series
+    })
+
+
 @app.route('/api/user/<nickname>/details')
 def get_user_details(nickname):
     stats = rating_system.get_user_stats(nickname)
@@ -5014,92 +6876,48 @@ def get_contest_details(contest_id):
         except:
             pass
 
-    results = []
-    monitor_file = division_dir / 'monitor.csv'
-
-    if processed and change_file.exists():
-        try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            start_line = 0
-            for i, line in enumerate(lines):
-                if '=====' in line:
-                    start_line = i + 1
-                    break
-
-            for line in lines[start_line:]:
-                line = line.strip()
-                if not line:
-                    continue
-
-                match = re.match(
-                    r'(\d+)\.\s+([^:]+):\s+(\d+)\s+\([^)]+\)\s+→\s+(\d+)\s+\([^)]+\)\s+\(([+-]\d+)\)',
-                    line)
-                if match:
-                    nickname = match.group(2).strip()
-                    old_rating = int(match.group(3))
-                    new_rating = int(match.group(4))
-                    change = int(match.group(5))
-
-                    unofficial = "[UNR]" in line
-
-                    score = "0"
-                    if monitor_file.exists():
-                        try:
-                            with open(monitor_file, 'r', encoding='utf-8') as mf:
-                                sample = mf.read(1024)
-                                mf.seek(0)
-
-                                if ';' in sample:
-                                    reader = csv.DictReader(mf, delimiter=';')
-                                else:
-                                    reader = csv.DictReader(mf)
-
-                                for row in reader:
-                                    row_nickname = row.get('user_name', '') or row.get('login', '')
-                                    if row_nickname.strip() == nickname:
-                                        score = row.get('Score', '0').strip()
-                                        break
-                        except:
-                            pass
-
-                    results.append({
-                        'nickname': nickname,
-                        'score': score,
-                        'rating': new_rating,
-                        'change': change,
-                        'unofficial': unofficial
-                    })
-        except:
-            pass
-
-    tasks_count = 0
-    if monitor_file.exists():
-        try:
-            with open(monitor_file, 'r', encoding='utf-8') as f:
-                sample = f.read(1024)
-                f.seek(0)
-
-                if ';' in sample:
-                    reader = csv.DictReader(f, delimiter=';')
-                else:
-                    reader = csv.DictReader(f)
+    results = []
+    monitor_file = division_dir / 'monitor.csv'
 
-                fieldnames = reader.fieldnames or []
-                exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
-                                  'Score', 'Penalty', 'score', 'penalty', 'Баллы', 'баллы',
-                                  'user', 'User', 'USER', 'фио', 'ФИО']
+    try:
+        monitor = get_parsed_monitor(monitor_file)
+    except:
+        monitor = None
 
-                for field in fieldnames:
-                    if (field not in exclude_fields and
-                            not field.startswith('Unnamed:') and
-                            not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
-                            field.strip() != ''):
-                        tasks_count += 1
+    if processed and change_file.exists():
+        try:
+            for row in get_parsed_change(change_file).rows:
+                nickname = row['nickname']
+
+                score = "0"
+                if monitor is not None:
+                    row_index = monitor.find(nickname)
+                    if row_index is not None:
+                        score = (monitor.rows[row_index].get('Score', '0') or '').strip()
+
+                results.append({
+                    'nickname': nickname,
+                    'score': score,
+                    'rating': row['new_rating'],
+                    'change': row['change'],
+                    'unofficial': row['unofficial']
+                })
         except:
             pass
 
+    tasks_count = 0
+    if monitor is not None:
+        exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
+                          'Score', 'Penalty', 'score', 'penalty', 'Баллы', 'баллы',
+                          'user', 'User', 'USER', 'фио', 'ФИО']
+
+        for field in monitor.fieldnames:
+            if (field not in exclude_fields and
+                    not field.startswith('Unnamed:') and
+                    not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
+                    field.strip() != ''):
+                tasks_count += 1
+
     divisions = []
     total_participants = 0
 
@@ -5121,17 +6939,10 @@ def get_contest_details(contest_id):
             participants = 0
             if div_change.exists():
                 try:
-                    with open(div_change, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if 'Участников официально:' in line:
-                                parts = line.split(':')
-                                if len(parts) > 1:
-                                    try:
-                                        participants = int(parts[1].strip())
-                                        total_participants += participants
-                                    except:
-                                        pass
-                                break
+                    parsed = get_parsed_change(div_change)
+                    if parsed.official_participants is not None:
+                        participants = parsed.official_participants
+                        total_participants += participants
                 except:
                     pass
 
@@ -5155,16 +6966,10 @@ def get_contest_details(contest_id):
 
     if processed and change_file.exists():
         try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                for line in lines:
-                    if 'Дата обработки:' in line:
-                        date_part = line.split('Дата обработки:')[1].strip()
-                        date = date_part.split()[0]
-                    elif line.strip().startswith('1.'):
-                        winner_match = re.match(r'1\.\s+([^:]+):', line)
-                        if winner_match:
-                            winner = winner_match.group(1).strip()
+            parsed = get_parsed_change(change_file)
+            if parsed.date:
+                date = parsed.date
+            winner = parsed.winner
         except:
             pass
 
@@ -5213,30 +7018,12 @@ def get_training_details(training_id):
 
     if processed and change_file.exists():
         try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            start_line = 0
-            for i, line in enumerate(lines):
-                if '=====' in line:
-                    start_line = i + 1
-                    break
-
-            for line in lines[start_line:]:
-                line = line.strip()
-                if not line:
-                    continue
-
-                match = re.match(r'(\d+)\.\s+([^:]+):\s+решено\s+(\d+)\s+задач', line)
-                if match:
-                    nickname = match.group(2).strip()
-                    solved = int(match.group(3))
-
-                    results.append({
-                        'nickname': nickname,
-                        'solved': solved,
-                        'points': solved,
-                    })
+            for row in get_parsed_change(change_file).training_rows:
+                results.append({
+                    'nickname': row['nickname'],
+                    'solved': row['solved'],
+                    'points': row['solved'],
+                })
         except:
             pass
 
@@ -5245,25 +7032,16 @@ def get_training_details(training_id):
     tasks_count = 0
     if monitor_file.exists():
         try:
-            with open(monitor_file, 'r', encoding='utf-8') as f:
-                sample = f.read(1024)
-                f.seek(0)
-
-                if ';' in sample:
-                    reader = csv.DictReader(f, delimiter=';')
-                else:
-                    reader = csv.DictReader(f)
-
-                fieldnames = reader.fieldnames or []
-                exclude_fields = ['place', 'user_name', 'login', 'user', 'User', 'USER',
-                                  'Score', 'Penalty', 'score', 'penalty', 'фио', 'ФИО']
-
-                for field in fieldnames:
-                    if (field not in exclude_fields and
-                            not field.startswith('Unnamed:') and
-                            not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
-                            field.strip() != ''):
-                        tasks_count += 1
+            fieldnames = get_parsed_monitor(monitor_file).fieldnames
+            exclude_fields = ['place', 'user_name', 'login', 'user', 'User', 'USER',
+                              'Score', 'Penalty', 'score', 'penalty', 'фио', 'ФИО']
+
+            for field in fieldnames:
+                if (field not in exclude_fields and
+                        not field.startswith('Unnamed:') and
+                        not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower()) and
+                        field.strip() != ''):
+                    tasks_count += 1
         except:
             pass
 
@@ -5293,12 +7071,9 @@ def get_training_details(training_id):
     date = "Неизвестно"
     if change_file.exists():
         try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if 'Дата обработки:' in line:
-                        date_part = line.split('Дата обработки:')[1].strip()
-                        date = date_part.split()[0]
-                        break
+            parsed = get_parsed_change(change_file)
+            if parsed.date:
+                date = parsed.date
         except:
             pass
 
@@ -5348,39 +7123,13 @@ def get_team_contest_details(contest_id):
 
     if processed and change_file.exists():
         try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            start_line = 0
-            for i, line in enumerate(lines):
-                if '=====' in line:
-                    start_line = i + 1
-                    break
-
-            for line in lines[start_line:]:
-                line = line.strip()
-                if not line:
-                    continue
-
-                match = re.match(r'(\d+)\.\s+([^:]+):\s+(\d+)\s+баллов', line)
-                if match:
-                    team_name = match.group(2).strip()
-                    score = int(match.group(3))
-
-                    members = []
-                    if '(' in line and ')' in line:
-                        members_part = line[line.find('(') + 1:line.find(')')]
-                        if 'Участники:' in members_part:
-                            members = [m.strip() for m in members_part.split('Участники:')[1].split(',')]
-                        else:
-                            members = [m.strip() for m in members_part.split(',')]
-
-                    results.append({
-                        'team_name': team_name,
-                        'score': score,
-                        'members': members,
-                        'member_count': len(members)
-                    })
+            for row in get_parsed_change(change_file).team_rows:
+                results.append({
+                    'team_name': row['team_name'],
+                    'score': row['score'],
+                    'members': row['members'],
+                    'member_count': len(row['members'])
+                })
         except:
             pass
 
@@ -5389,28 +7138,18 @@ def get_team_contest_details(contest_id):
 
     if monitor_file.exists():
         try:
-            with open(monitor_file, 'r', encoding='utf-8') as f:
-                sample = f.read(1024)
-                f.seek(0)
-
-                if ';' in sample:
-                    reader = csv.DictReader(f, delimiter=';')
-                else:
-                    reader = csv.DictReader(f)
-
-                fieldnames = reader.fieldnames or []
-                exclude_fields = ['place', 'team_name', 'Team', 'Команда', 'team',
-                                  'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
-                                  'members', 'Участники', 'участники']
+            monitor = get_parsed_monitor(monitor_file)
+            exclude_fields = ['place', 'team_name', 'Team', 'Команда', 'team',
+                              'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
+                              'members', 'Участники', 'участники']
 
-                for field in fieldnames:
-                    if (field not in exclude_fields and
-                            not field.startswith('Unnamed:') and
-                            field.strip() != ''):
-                        tasks_count += 1
+            for field in monitor.fieldnames:
+                if (field not in exclude_fields and
+                        not field.startswith('Unnamed:') and
+                        field.strip() != ''):
+                    tasks_count += 1
 
-                f.seek(0)
-                teams = sum(1 for _ in reader)
+            teams = len(monitor.rows)
         except:
             pass
 
@@ -5431,12 +7170,9 @@ def get_team_contest_details(contest_id):
     date = "Неизвестно"
     if change_file.exists():
         try:
-            with open(change_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if 'Дата обработки:' in line:
-                        date_part = line.split('Дата обработки:')[1].strip()
-                        date = date_part.split()[0]
-                        break
+            parsed = get_parsed_change(change_file)
+            if parsed.date:
+                date = parsed.date
         except:
             pass
 
@@ -5613,114 +7349,38 @@ def get_contest_monitor(contest_id):
         if change_file.exists():
             participants_from_change = []
             try:
-                with open(change_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-
-                start_line = 0
-                for i, line in enumerate(lines):
-                    if '=====' in line:
-                        start_line = i + 1
-                        break
-
-                for line in lines[start_line:]:
-                    line = line.strip()
-                    if not line:
-                        continue
+                monitor = get_parsed_monitor(monitor_file)
+            except:
+                monitor = None
 
-                    # Определяем unofficial статус
-                    unofficial = "[UNR]" in line or "UNRATED" in line
-
-                    # Убираем маркеры unofficial из строки для парсинга
-                    clean_line = line.replace('[UNR]', '').replace('UNRATED', '').strip()
-
-                    # Парсим строку
-                    match = re.match(
-                        r'(\d+)\.\s+([^:]+):\s+(\d+)\s+\([^)]+\)\s+→\s+(\d+)\s+\([^)]+\)\s+\(([+-]\d+)\)',
-                        clean_line)
-                    if match:
-                        nickname = match.group(2).strip()
-                        old_rating = int(match.group(3))
-                        new_rating = int(match.group(4))
-                        change = int(match.group(5))
-
-                        # Извлекаем количество решенных задач если есть
-                        tasks_solved_match = re.search(r'задач:\s+(\d+)', clean_line)
-                        tasks_solved = int(tasks_solved_match.group(1)) if tasks_solved_match else 0
-
-                        # Извлекаем allowed_division если есть
-                        allowed_division_match = re.search(r'allowed_div:(\d+)', line)
-                        allowed_division = int(allowed_division_match.group(1)) if allowed_division_match else division
-
-                        # Берем данные из монитора для тасков
-                        tasks = []
-                        if monitor_file.exists():
-                            try:
-                                with open(monitor_file, 'r', encoding='utf-8') as mf:
-                                    sample = mf.read(1024)
-                                    mf.seek(0)
-
-                                    if ';' in sample:
-                                        reader = csv.DictReader(mf, delimiter=';')
-                                    else:
-                                        reader = csv.DictReader(mf)
-
-                                    fieldnames = reader.fieldnames or []
-                                    exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
-                                                      'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
-                                                      'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name', 'никнейм',
-                                                      'Имя', 'имя', 'Nickname', 'nickname']
-
-                                    task_names = [field for field in fieldnames
-                                                  if field not in exclude_fields
-                                                  and not field.startswith('Unnamed:')
-                                                  and not re.match(r'^(фио|ФИО|user|name|имя|никнейм)', field.lower())
-                                                  and field.strip() != '']
-
-                                    for row in reader:
-                                        row_nickname = row.get('user_name', '') or row.get('login', '') or row.get(
-                                            'Участник', '')
-                                        if row_nickname.strip() == nickname:
-                                            for task_name in task_names:
-                                                task_value = row.get(task_name, '').strip()
-                                                status = 'pending'
-                                                display = task_value
-
-                                                if task_value:
-                                                    if '+' in task_value:
-                                                        status = 'solved'
-                                                        display = '+' + task_value.replace('+', '')
-                                                    elif task_value.isdigit() and int(task_value) > 0:
-                                                        status = 'solved'
-                                                        display = task_value
-                                                    elif '-' in task_value:
-                                                        status = 'attempted'
-                                                        display = '-' + task_value.replace('-', '')
-
-                                                tasks.append({
-                                                    'name': task_name,
-                                                    'value': task_value,
-                                                    'status': status,
-                                                    'display': display
-                                                })
-                                            break
-                            except:
-                                pass
-
-                        participants_from_change.append({
-                            'nickname': nickname,
-                            'rating': new_rating,
-                            'change': change,
-                            'unofficial': unofficial,
-                            'tasks': tasks,
-                            'tasks_solved': tasks_solved,
-                            'allowed_division': allowed_division
-                        })
+            try:
+                for row in get_parsed_change(change_file).rows:
+                    nickname = row['nickname']
+                    unofficial = row['unofficial']
+
+                    # Берем данные из монитора для тасков
+                    tasks = []
+                    if monitor is not None:
+                        task_names = monitor.task_names
+                        row_index = monitor.find(nickname)
+                        if row_index is not None:
+                            tasks = monitor.cells[row_index]
+
+                    participants_from_change.append({
+                        'nickname': nickname,
+                        'rating': row['new_rating'],
+                        'change': row['change'],
+                        'unofficial': unofficial,
+                        'tasks': tasks,
+                        'tasks_solved': row['tasks_solved'],
+                        'allowed_division': row['allowed_division'] or division
+                    })
 
-                        if unofficial:
-                            stats['unofficial_participants'] += 1
-                        else:
-                            stats['official_participants'] += 1
-                            stats['total_participants'] += 1
+                    if unofficial:
+                        stats['unofficial_participants'] += 1
+                    else:
+                        stats['official_participants'] += 1
+                        stats['total_participants'] += 1
 
             except Exception as e:
                 print(f"Ошибка чтения change.txt: {e}")
@@ -5746,123 +7406,80 @@ def get_contest_monitor(contest_id):
 
         # Если нет change.txt, загружаем из monitor.csv
         else:
-            with open(monitor_file, 'r', encoding='utf-8') as f:
-                sample = f.read(1024)
-                f.seek(0)
+            monitor = get_parsed_monitor(monitor_file)
+            task_names = monitor.task_names
 
-                if ';' in sample:
-                    reader = csv.DictReader(f, delimiter=';')
-                else:
-                    reader = csv.DictReader(f)
+            stats['tasks_count'] = len(task_names)
 
-                fieldnames = reader.fieldnames or []
+            for i, row in enumerate(monitor.rows):
+                nickname = monitor.nicknames[i]
+                if nickname:
+                    score_str = row.get('Score', '0') or row.get('score', '0') or row.get('Баллы', '0')
+                    try:
+                        score = float(score_str)
+                    except:
+                        score = 0
 
-                exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
-                                  'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
-                                  'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name', 'никнейм',
-                                  'Имя', 'имя', 'Nickname', 'nickname']
+                    # Определяем unofficial на основе строгого правила
+                    user_ratings = rating_system.users.get(nickname, {1: 0, 2: 0, 3: 0, 4: 0})
+
+                    # НАХОДИМ МАКСИМАЛЬНЫЙ РЕЙТИНГ пользователя
+                    max_rating = 0
+                    for div in [1, 2, 3, 4]:
+                        rating = user_ratings.get(div, 0)
+                        if rating > max_rating:
+                            max_rating = rating
+
+                    # СТРОГОЕ ПРАВИЛО: определяем разрешенный дивизион по максимальному рейтингу
+                    allowed_division = None
+
+                    if max_rating == 0:
+                        # Новичок без рейтинга - только Div4
+                        allowed_division = 4
+                    elif 0 <= max_rating <= 999:
+                        allowed_division = 4
+                    elif 1000 <= max_rating <= 1999:
+                        allowed_division = 3
+                    elif 2000 <= max_rating <= 2999:
+                        allowed_division = 2
+                    elif 3000 <= max_rating <= 4000:
+                        allowed_division = 1
+                    else:
+                        # Если рейтинг выше 4000 - Div1
+                        allowed_division = 1
 
-                task_names = [field for field in fieldnames
-                              if field not in exclude_fields
-                              and not field.startswith('Unnamed:')
-                              and not re.match(r'^(фий|ФИО|user|name|имя|никнейм)', field.lower())
-                              and field.strip() != '']
+                    # Определяем unofficial статус
+                    # Участник официальный ТОЛЬКО если пишет в своем allowed_division
+                    unofficial = (division != allowed_division)
 
-                stats['tasks_count'] = len(task_names)
+                    # Для отладки
+                    if max_rating >= 1000 and division == 4:
+                        print(
+                            f"СТРОГОЕ ПРАВИЛО: {nickname} rating={max_rating}, allowed_div={allowed_division}, current_div={division}, unofficial={unofficial}")
 
-                for i, row in enumerate(reader):
-                    nickname = row.get('user_name', '') or row.get('login', '') or row.get('Участник', '')
-                    if nickname and nickname.strip():
-                        nickname = nickname.strip()
+                    tasks = monitor.cells[i]
 
-                        score_str = row.get('Score', '0') or row.get('score', '0') or row.get('Баллы', '0')
-                        try:
-                            score = float(score_str)
-                        except:
-                            score = 0
-
-                        # Определяем unofficial на основе строгого правила
-                        user_ratings = rating_system.users.get(nickname, {1: 0, 2: 0, 3: 0, 4: 0})
-
-                        # НАХОДИМ МАКСИМАЛЬНЫЙ РЕЙТИНГ пользователя
-                        max_rating = 0
-                        for div in [1, 2, 3, 4]:
-                            rating = user_ratings.get(div, 0)
-                            if rating > max_rating:
-                                max_rating = rating
-
-                        # СТРОГОЕ ПРАВИЛО: определяем разрешенный дивизион по максимальному рейтингу
-                        allowed_division = None
-
-                        if max_rating == 0:
-                            # Новичок без рейтинга - только Div4
-                            allowed_division = 4
-                        elif 0 <= max_rating <= 999:
-                            allowed_division = 4
-                        elif 1000 <= max_rating <= 1999:
-                            allowed_division = 3
-                        elif 2000 <= max_rating <= 2999:
-                            allowed_division = 2
-                        elif 3000 <= max_rating <= 4000:
-                            allowed_division = 1
-                        else:
-                            # Если рейтинг выше 4000 - Div1
-                            allowed_division = 1
-
-                        # Определяем unofficial статус
-                        # Участник официальный ТОЛЬКО если пишет в своем allowed_division
-                        unofficial = (division != allowed_division)
-
-                        # Для отладки
-                        if max_rating >= 1000 and division == 4:
-                            print(
-                                f"СТРОГОЕ ПРАВИЛО: {nickname} rating={max_rating}, allowed_div={allowed_division}, current_div={division}, unofficial={unofficial}")
-
-                        tasks = []
-                        for task_name in task_names:
-                            task_value = row.get(task_name, '').strip()
-                            status = 'pending'
-                            display = task_value
-
-                            if task_value:
-                                if '+' in task_value:
-                                    status = 'solved'
-                                    display = '+' + task_value.replace('+', '')
-                                elif task_value.isdigit() and int(task_value) > 0:
-                                    status = 'solved'
-                                    display = task_value
-                                elif '-' in task_value:
-                                    status = 'attempted'
-                                    display = '-' + task_value.replace('-', '')
-
-                            tasks.append({
-                                'name': task_name,
-                                'value': task_value,
-                                'status': status,
-                                'display': display
-                            })
-
-                        current_rating = user_ratings.get(division, 0)
-
-                        participants.append({
-                            'nickname': nickname,
-                            'score': score,
-                            'rating': current_rating,
-                            'unofficial': unofficial,
-                            'tasks': tasks,
-                            'position': i + 1,
-                            'allowed_division': allowed_division,
-                            'max_rating': max_rating
-                        })
+                    current_rating = user_ratings.get(division, 0)
+
+                    participants.append({
+                        'nickname': nickname,
+                        'score': score,
+                        'rating': current_rating,
+                        'unofficial': unofficial,
+                        'tasks': tasks,
+                        'position': i + 1,
+                        'allowed_division': allowed_division,
+                        'max_rating': max_rating
+                    })
 
-                        if unofficial:
-                            stats['unofficial_participants'] += 1
-                        else:
-                            stats['total_participants'] += 1
-                            stats['official_participants'] += 1
+                    if unofficial:
+                        stats['unofficial_participants'] += 1
+                    else:
+                        stats['total_participants'] += 1
+                        stats['official_participants'] += 1
 
-                        if score > stats['max_score']:
-                            stats['max_score'] = score
+                    if score > stats['max_score']:
+                        stats['max_score'] = score
 
             # Сортируем только официальных участников
             official_participants = [p for p in participants if not p['unofficial']]
@@ -5884,9 +7501,7 @@ def get_contest_monitor(contest_id):
                 if div_monitor.exists():
                     participants_count = 0
                     try:
-                        with open(div_monitor, 'r', encoding='utf-8') as f:
-                            reader = csv.DictReader(f)
-                            participants_count = sum(1 for _ in reader)
+                        participants_count = len(get_parsed_monitor(div_monitor).rows)
                     except:
                         pass
 
@@ -5901,12 +7516,9 @@ def get_contest_monitor(contest_id):
         date = "Неизвестно"
         if change_file.exists():
             try:
-                with open(change_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if 'Дата обработки:' in line:
-                            date_part = line.split('Дата обработки:')[1].strip()
-                            date = date_part.split()[0]
-                            break
+                parsed = get_parsed_change(change_file)
+                if parsed.date:
+                    date = parsed.date
             except:
                 pass
 
@@ -5959,125 +7571,96 @@ def get_team_contest_monitor(contest_id):
             'members_per_team': 1
         }
 
-        with open(monitor_file, 'r', encoding='utf-8') as f:
-            sample = f.read(1024)
-            f.seek(0)
-
-            if ';' in sample:
-                reader = csv.DictReader(f, delimiter=';')
-            else:
-                reader = csv.DictReader(f)
+        monitor = get_parsed_monitor(monitor_file)
+        fieldnames = monitor.fieldnames
 
-            fieldnames = reader.fieldnames or []
+        team_name_field = None
+        possible_fields = ['user_name', 'login', 'Участник', 'участник', 'team_name', 'Team', 'Команда',
+                           'team', 'Name', 'name', 'Имя', 'имя', 'ФИО', 'фио', 'user', 'User']
 
-            team_name_field = None
-            possible_fields = ['user_name', 'login', 'Участник', 'участник', 'team_name', 'Team', 'Команда',
-                               'team', 'Name', 'name', 'Имя', 'имя', 'ФИО', 'фио', 'user', 'User']
+        for field in possible_fields:
+            if field in fieldnames:
+                team_name_field = field
+                break
 
-            for field in possible_fields:
-                if field in fieldnames:
+        if not team_name_field and fieldnames:
+            exclude_first = ['place', 'место', 'Place']
+            for field in fieldnames:
+                if field not in exclude_first:
                     team_name_field = field
                     break
 
-            if not team_name_field and fieldnames:
-                exclude_first = ['place', 'место', 'Place']
-                for field in fieldnames:
-                    if field not in exclude_first:
-                        team_name_field = field
-                        break
-
-            score_field = None
-            possible_score_fields = ['Score', 'score', 'Баллы', 'баллы', 'points', 'Points']
-            for field in possible_score_fields:
-                if field in fieldnames:
-                    score_field = field
-                    break
-
-            exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
-                              'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
-                              'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name',
-                              'никнейм', 'Имя', 'имя', 'Nickname', 'nickname', 'team_name',
-                              'Team', 'Команда', 'team']
-
-            if team_name_field and team_name_field not in exclude_fields:
-                exclude_fields.append(team_name_field)
-            if score_field and score_field not in exclude_fields:
-                exclude_fields.append(score_field)
-
-            task_names = [field for field in fieldnames
-                          if field not in exclude_fields
-                          and not field.startswith('Unnamed:')
-                          and field.strip() != '']
-
-            stats['tasks_count'] = len(task_names)
-
-            for i, row in enumerate(reader):
-                if team_name_field and team_name_field in row:
-                    team_name = row[team_name_field]
-                    if team_name and str(team_name).strip():
-                        team_name = str(team_name).strip()
-
-                        score = 0
-                        if score_field and score_field in row:
-                            try:
-                                score = float(str(row[score_field]))
-                            except:
-                                pass
-                        else:
-                            for task_name in task_names:
-                                if task_name in row:
-                                    task_value = str(row[task_name]).strip()
-                                    if task_value and ('+' in task_value or task_value.isdigit()):
-                                        try:
-                                            if '+' in task_value:
-                                                num = task_value.replace('+', '').strip()
-                                                if num.isdigit():
-                                                    score += int(num)
-                                                else:
-                                                    score += 1
+        score_field = None
+        possible_score_fields = ['Score', 'score', 'Баллы', 'баллы', 'points', 'Points']
+        for field in possible_score_fields:
+            if field in fieldnames:
+                score_field = field
+                break
+
+        exclude_fields = ['place', 'user_name', 'login', 'Участник', 'участник',
+                          'Score', 'score', 'Баллы', 'баллы', 'Penalty', 'penalty',
+                          'user', 'User', 'USER', 'фио', 'ФИО', 'Name', 'name',
+                          'никнейм', 'Имя', 'имя', 'Nickname', 'nickname', 'team_name',
+                          'Team', 'Команда', 'team']
+
+        if team_name_field and team_name_field not in exclude_fields:
+            exclude_fields.append(team_name_field)
+        if score_field and score_field not in exclude_fields:
+            exclude_fields.append(score_field)
+
+        task_names = [field for field in fieldnames
+                      if field not in exclude_fields
+                      and not field.startswith('Unnamed:')
+                      and field.strip() != '']
+
+        stats['tasks_count'] = len(task_names)
+
+        for i, row in enumerate(monitor.rows):
+            if team_name_field and team_name_field in row:
+                team_name = row[team_name_field]
+                if team_name and str(team_name).strip():
+                    team_name = str(team_name).strip()
+
+                    score = 0
+                    if score_field and score_field in row:
+                        try:
+                            score = float(str(row[score_field]))
+                        except:
+                            pass
+                    else:
+                        for task_name in task_names:
+                            if task_name in row:
+                                task_value = str(row[task_name]).strip()
+                                if task_value and ('+' in task_value or task_value.isdigit()):
+                                    try:
+                                        if '+' in task_value:
+                                            num = task_value.replace('+', '').strip()
+                                            if num.isdigit():
+                                                score += int(num)
                                             else:
-                                                score += int(task_value)
-                                        except:
-                                            score += 1
+                                                score += 1
+                                        else:
+                                            score += int(task_value)
+                                    except:
+                                        score += 1
 
-                        members = [team_name]
+                    members = [team_name]
 
-                        tasks = []
-                        for task_name in task_names:
-                            task_value = row.get(task_name, '').strip()
-                            status = 'pending'
-                            display = task_value
-
-                            if task_value:
-                                if '+' in task_value:
-                                    status = 'solved'
-                                    display = '+' + task_value.replace('+', '')
-                                elif task_value.isdigit() and int(task_value) > 0:
-                                    status = 'solved'
-                                    display = task_value
-                                elif '-' in task_value:
-                                    status = 'attempted'
-                                    display = '-' + task_value.replace('-', '')
-
-                            tasks.append({
-                                'name': task_name,
-                                'value': task_value,
-                                'status': status,
-                                'display': display
-                            })
-
-                        teams.append({
-                            'team_name': team_name,
-                            'score': score,
-                            'members': members,
-                            'member_count': 1,
-                            'tasks': tasks,
-                            'position': i + 1
-                        })
+                    tasks = [ParsedMonitor.parse_cell(task_name, row.get(task_name))
+                             for task_name in task_names]
+
+                    teams.append({
+                        'team_name': team_name,
+                        'score': score,
+                        'members': members,
+                        'member_count': 1,
+                        'tasks': tasks,
+                        'position': i + 1
+                    })
 
-                        stats['total_teams'] += 1
-                        if score > stats['max_score']:
-                            stats['max_score'] = score
+                    stats['total_teams'] += 1
+                    if score > stats['max_score']:
+                        stats['max_score'] = score
 
         teams.sort(key=lambda x: x['score'], reverse=True)
 
@@ -6087,12 +7670,9 @@ def get_team_contest_monitor(contest_id):
         date = "Неизвестно"
         if change_file.exists():
             try:
-                with open(change_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if 'Дата обработки:' in line:
-                            date_part = line.split('Дата обработки:')[1].strip()
-                            date = date_part.split()[0]
-                            break
+                parsed = get_parsed_change(change_file)
+                if parsed.date:
+                    date = parsed.date
             except:
                 pass
 
@@ -6155,81 +7735,297 @@ def download_team_contest_monitor(contest_id):
     return send_from_directory(contest_path, 'monitor.csv', as_attachment=True)
 
 
-@app.route('/api/contest/<contest_id>/process', methods=['POST'])
-def process_contest_division(contest_id):
-    data = request.get_json() or {}
-    division = data.get('division', 1)
+# ========== ФОНОВАЯ ОБРАБОТКА ==========
 
-    try:
-        division = int(division)
-    except:
-        division = 1
+# В serverless (FAST_START) фоновый поток не переживает ответ, а опрос статуса может попасть
+# на другой экземпляр - там задания выполняются прямо в запросе
+PROCESS_INLINE = FAST_START
 
-    success, message = rating_system.process_division(contest_id, division)
 
-    if success:
+class JobQueue:
+    """Очередь заданий обработки: один рабочий поток выполняет их строго по очереди.
+
+    Состояние каждого задания лежит в файле jobs_path/<id>.json, поэтому статус
+    отвечает любой воркер, а не только тот, что принял задание. Пока задание ждет
+    или выполняется, воркер-владелец (owner_pid) обновляет в файле heartbeat; задание
+    без обновлений дольше STALE_AFTER осталось от остановленного воркера и считается
+    проваленным.
+    """
+
+    MAX_FINISHED = 200  # Сколько завершенных заданий хранить для запросов статуса
+    PROGRESS_INTERVAL = 0.5  # Не чаще, чем раз в столько секунд, прогресс пишется на диск
+    HEARTBEAT_INTERVAL = 10  # Как часто владелец подтверждает, что его задания живы (сек)
+    STALE_AFTER = 60  # Через сколько секунд без heartbeat задание считается брошенным
+    JOB_ID_RE = re.compile(r'^[0-9a-f]{12}$')
+
+    def __init__(self, jobs_path):
+        self.jobs_path = Path(jobs_path)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # Фоновые и синхронные задания не выполняются одновременно
+        self._worker = None
+        self._heartbeat_thread = None
+        self._active = {}  # {id: задание} - ждущие и выполняемые задания этого процесса
+
+    def _job_file(self, job_id):
+        return self.jobs_path / f'{job_id}.json'
+
+    def _save(self, job):
+        """Атомарно записывает состояние задания под файловой блокировкой"""
+        with self._lock:
+            job['heartbeat'] = time.time()
+            data = json.dumps(job, ensure_ascii=False)
+
+        target = self._job_file(job['id'])
+        temp_file = target.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            self.jobs_path.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.jobs_path / 'jobs.lock'):
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(temp_file, target)
+        except OSError as e:
+            print(f"Ошибка записи состояния задания {job['id']}: {e}")
+
+    def _create(self, kind, target):
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'kind': kind,
+            'target': target,
+            'status': 'queued',
+            'progress': {},
+            'message': None,
+            'error': None,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'started_at': None,
+            'finished_at': None,
+            'owner_pid': os.getpid(),
+            'heartbeat': None
+        }
+        self._trim()
+        with self._lock:
+            self._active[job['id']] = job
+            if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+                self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True)
+                self._heartbeat_thread.start()
+        self._save(job)
+        return job
+
+    def submit(self, kind, target, func):
+        """Ставит func(progress) -> (success, message) в очередь и возвращает задание"""
+        job = self._create(kind, target)
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, daemon=True)
+                self._worker.start()
+        self._queue.put((job, func))
+        return job
+
+    def run_inline(self, kind, target, func):
+        """Выполняет задание в текущем потоке (для serverless, где фоновые потоки не живут)"""
+        job = self._create(kind, target)
+        self._run(job, func)
+        return job
+
+    def get(self, job_id):
+        """Состояние задания с диска (None, если такого нет); брошенное задание помечается проваленным"""
+        if not self.JOB_ID_RE.match(job_id or ''):
+            return None
+        try:
+            with open(self._job_file(job_id), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self._is_stale(job):
+            job['status'] = 'failed'
+            job['error'] = 'Воркер, выполнявший задание, остановился'
+            job['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self._save(job)
+        return job
+
+    def _is_stale(self, job):
+        """Задание ждет или выполняется, но его владелец больше не подает признаков жизни"""
+        if job.get('status') not in ('queued', 'running'):
+            return False
+        if job.get('owner_pid') == os.getpid():
+            # Свой процесс знает свои задания точно
+            with self._lock:
+                return job['id'] not in self._active
+        return time.time() - (job.get('heartbeat') or 0) > self.STALE_AFTER
+
+    def _trim(self):
+        """Удаляет самые старые завершенные задания сверх MAX_FINISHED"""
+        try:
+            finished = []
+            with file_lock(self.jobs_path / 'jobs.lock'):
+                for job_file in self.jobs_path.glob('*.json'):
+                    try:
+                        with open(job_file, 'r', encoding='utf-8') as f:
+                            job = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    if job.get('status') in ('done', 'failed') or self._is_stale(job):
+                        finished.append((job_file.stat().st_mtime_ns, job_file))
+
+                finished.sort()
+                for _, job_file in finished[:max(0, len(finished) - self.MAX_FINISHED)]:
+                    job_file.unlink()
+        except OSError:
+            pass
+
+    def _heartbeat(self):
+        """Периодически переписывает файлы своих активных заданий, обновляя heartbeat"""
+        while True:
+            time.sleep(self.HEARTBEAT_INTERVAL)
+            with self._lock:
+                jobs = list(self._active.values())
+            for job in jobs:
+                self._save(job)
+
+    def _work(self):
+        while True:
+            job, func = self._queue.get()
+            self._run(job, func)
+            self._queue.task_done()
+
+    def _run(self, job, func):
+        last_saved = [0.0]
+
+        def progress(**fields):
+            with self._lock:
+                job['progress'].update(fields)
+            now = time.monotonic()
+            if now - last_saved[0] >= self.PROGRESS_INTERVAL:
+                last_saved[0] = now
+                self._save(job)
+
+        with self._run_lock:
+            with self._lock:
+                job['status'] = 'running'
+                job['started_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self._save(job)
+
+            try:
+                success, message = func(progress)
+            except Exception as e:
+                success, message = False, f"Ошибка обработки: {e}"
+            finally:
+                catalog.invalidate()
+
+        with self._lock:
+            job['status'] = 'done' if success else 'failed'
+            job['message' if success else 'error'] = message
+            job['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._save(job)
+        with self._lock:
+            self._active.pop(job['id'], None)
+
+
+processing_jobs = JobQueue(Path('contestants') / 'jobs')
+
+
+def enqueue_processing(kind, target, func):
+    """Ставит обработку в очередь; с ?wait=1 или в serverless выполняет ее сразу и возвращает результат"""
+    if PROCESS_INLINE or request.args.get('wait') == '1':
+        job = processing_jobs.run_inline(kind, target, func)
+        if job['status'] == 'done':
+            return jsonify({'success': True, 'job_id': job['id'], 'message': job['message']})
+        return jsonify({'success': False, 'job_id': job['id'], 'error': job['error']})
+
+    job = processing_jobs.submit(kind, target, func)
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': f"/api/jobs/{job['id']}"
+    }), 202
+
+
+@app.route('/api/contests/process-range', methods=['POST'])
+def process_contest_range_route():
+    data = request.get_json(silent=True) or {}
+    first = data.get('first')
+    last = data.get('last', first)
+
+    return enqueue_processing('contest_range', f'{first}..{last}',
+                              lambda progress: rating_system.process_contest_range(first, last, progress))
+
+
+@app.route('/api/jobs/<job_id>')
+def get_job_status(job_id):
+    job = processing_jobs.get(job_id)
+
+    if job:
         return jsonify({
             'success': True,
-            'message': message
+            'job': job
         })
     else:
         return jsonify({
             'success': False,
-            'error': message
+            'error': 'Задание не найдено'
         })
 
 
-@app.route('/api/contest/<contest_id>/process-all', methods=['POST'])
-def process_all_divisions(contest_id):
-    success, message = rating_system.process_all_divisions(contest_id)
+@app.route('/api/contest/<contest_id>/preview')
+def preview_contest_division(contest_id):
+    division = request.args.get('division', 1)
+
+    try:
+        division = int(division)
+    except:
+        division = 1
+
+    success, result = rating_system.preview_division(contest_id, division)
 
     if success:
         return jsonify({
             'success': True,
-            'message': message
+            'preview': result
         })
     else:
         return jsonify({
             'success': False,
-            'error': message
+            'error': result
         })
 
 
+@app.route('/api/contest/<contest_id>/process', methods=['POST'])
+def process_contest_division(contest_id):
+    data = request.get_json(silent=True) or {}
+    division = data.get('division', 1)
+
+    try:
+        division = int(division)
+    except:
+        division = 1
+
+    return enqueue_processing('contest_division', f'{contest_id}/div{division}',
+                              lambda progress: rating_system.process_division(contest_id, division, progress))
+
+
+@app.route('/api/contest/<contest_id>/process-all', methods=['POST'])
+def process_all_divisions(contest_id):
+    return enqueue_processing('contest', contest_id,
+                              lambda progress: rating_system.process_all_divisions(contest_id, progress))
+
+
 @app.route('/api/training/<training_id>/process', methods=['POST'])
 def process_training_route(training_id):
-    success, message = rating_system.process_training(training_id)
-
-    if success:
-        return jsonify({
-            'success': True,
-            'message': message
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'error': message
-        })
+    return enqueue_processing('training', training_id,
+                              lambda progress: rating_system.process_training(training_id))
 
 
 @app.route('/api/team_contest/<contest_id>/process', methods=['POST'])
 def process_team_contest_route(contest_id):
-    success, message = rating_system.process_team_contest(contest_id)
-
-    if success:
-        return jsonify({
-            'success': True,
-            'message': message
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'error': message
-        })
+    return enqueue_processing('team_contest', contest_id,
+                              lambda progress: rating_system.process_team_contest(contest_id))
 
 
 @app.route('/api/users')
 def api_users():
-    participants = get_participants()
+    participants = catalog.get('participants')
     return jsonify({
         'success': True,
         'count': len(participants),
@@ -6320,8 +8116,11 @@ def get_math_details(math_id):
 
 @app.route('/users')
 def users_page():
-    participants = get_participants()
+    # Страница не зависит от данных: список участников подгружается из /api/users
+    return page_cache.respond('users', 1, render_users_page)
+
 
+def render_users_page():
     html = '''
     <!DOCTYPE html>
     <html lang="ru">
@@ -6482,7 +8281,7 @@ def users_page():
     <body>
         <div class="container">
             <h1>
-                <span>Все участники (''' + str(len(participants)) + ''')</span>
+                <span>Все участники (<span id="usersCount">…</span>)</span>
                 <a href="/" class="back-btn">← Назад к дашборду</a>
             </h1>
 
@@ -6497,35 +8296,6 @@ def users_page():
             <div class="user-grid" id="userGrid">
     '''
 
-    for i, participant in enumerate(participants, 1):
-        html += f'''
-                <div class="user-card" onclick="window.open('/', '_blank')">
-                    <div class="user-rank">{i}</div>
-                    <div class="user-avatar" style="background: {participant['avatar_color']};">{participant['avatar_text']}</div>
-                    <div class="user-name">{participant['nickname']}</div>
-                    <div class="user-rating" style="color: {participant['rank_color']};">{participant['rating']}</div>
-                    <div class="user-tasks-score">Задач: {participant['tasks_score']}</div>
-                    <div class="user-stats">
-                        <div class="stat-item">
-                            <div style="font-weight: bold;">Ранг</div>
-                            <div style="color: {participant['rank_color']};">{participant['rank']}</div>
-                        </div>
-                        <div class="stat-item">
-                            <div style="font-weight: bold;">Контестов</div>
-                            <div>{participant['contests']}</div>
-                        </div>
-                        <div class="stat-item">
-                            <div style="font-weight: bold;">Лучший рейтинг</div>
-                            <div>{participant['best_rating']}</div>
-                        </div>
-                        <div class="stat-item">
-                            <div style="font-weight: bold;">Последний контест</div>
-                            <div>{participant['last_contest']}</div>
-                        </div>
-                    </div>
-                </div>
-        '''
-
     html += '''
             </div>
 
@@ -6541,6 +8311,47 @@ def users_page():
         </div>
 
         <script>
+            function renderUsers(participants) {
+                document.getElementById('usersCount').textContent = participants.length;
+                document.getElementById('userGrid').innerHTML = participants.map((participant, index) => `
+                    <div class="user-card" onclick="window.open('/', '_blank')">
+                        <div class="user-rank">${index + 1}</div>
+                        <div class="user-avatar" style="background: ${participant.avatar_color};">${participant.avatar_text}</div>
+                        <div class="user-name">${participant.nickname}</div>
+                        <div class="user-rating" style="color: ${participant.rank_color};">${participant.rating}</div>
+                        <div class="user-tasks-score">Задач: ${participant.tasks_score}</div>
+                        <div class="user-stats">
+                            <div class="stat-item">
+                                <div style="font-weight: bold;">Ранг</div>
+                                <div style="color: ${participant.rank_color};">${participant.rank}</div>
+                            </div>
+                            <div class="stat-item">
+                                <div style="font-weight: bold;">Контестов</div>
+                                <div>${participant.contests}</div>
+                            </div>
+                            <div class="stat-item">
+                                <div style="font-weight: bold;">Лучший рейтинг</div>
+                                <div>${participant.best_rating}</div>
+                            </div>
+                            <div class="stat-item">
+                                <div style="font-weight: bold;">Последний контест</div>
+                                <div>${participant.last_contest}</div>
+                            </div>
+                        </div>
+                    </div>
+                `).join('');
+                filterUsers();
+            }
+
+            fetch('/api/users')
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        renderUsers(data.users);
+                    }
+                })
+                .catch(error => console.error('Ошибка загрузки участников:', error));
+
             function filterUsers() {
                 const searchInput = document.getElementById('searchInput');
                 const searchTerm = searchInput.value.toLowerCase().trim();
@@ -6560,6 +8371,48 @@ def users_page():
     return html
 
 
+@app.route('/api/startup')
+def get_startup_report():
+    return jsonify({
+        'success': True,
+        'fast_start': FAST_START,
+        'rating_system_loaded': rating_system._instance is not None,
+        'timings_ms': startup_timings
+    })
+
+
+@app.cli.command('backfill-sidecars')
+def backfill_sidecars_command():
+    """Создает change.json и записывает хэш monitor.csv для уже обработанных дивизионов"""
+    created, skipped = backfill_change_sidecars()
+    print(f"Создано change.json: {created}, пропущено: {skipped}")
+
+
+@app.cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    """Пересобирает all_ratings.txt из change.txt контестов и тренировок"""
+    rebuilt = RatingSystem('.', rebuild=True)
+    print(f"Рейтинги пересобраны, пользователей: {len(rebuilt.users)}")
+
+
+@app.cli.command('process-range')
+@click.argument('first')
+@click.argument('last')
+def process_range_command(first, last):
+    """Обрабатывает контесты FIRST..LAST (contest_N или N) с одним сохранением рейтингов"""
+    success, message = rating_system.process_contest_range(first, last)
+    print(message)
+    catalog.invalidate()
+    if not success:
+        raise SystemExit(1)
+
+
+if not FAST_START:
+    rating_system.load()
+    dashboard.template
+record_startup_timing('import', STARTUP_STARTED)
+
+
 if __name__ == '__main__':
     Path('contests').mkdir(exist_ok=True)
     Path('trainings').mkdir(exist_ok=True)